@@ -0,0 +1,411 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from urllib.parse import parse_qs, urlsplit
+
+import async_engine
+import database_manager
+import gemini_client
+import quiz_engine
+import rate_limiter
+import summarizer_logic
+import text_preprocessor
+import token_budget
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error", 502: "Bad Gateway",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    def __init__(self, method, target, headers, body):
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path.rstrip("/") or "/"
+        self.query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError as e:
+            raise HTTPError(400, f"Invalid JSON body: {e}")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "The JSON body must be an object")
+        return data
+
+
+async def read_request(reader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    body = b""
+    if method in ("POST", "PUT"):
+        if "content-length" not in headers:
+            raise HTTPError(411, "Content-Length is required")
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            raise HTTPError(400, "Content-Length must be an integer")
+        if length < 0:
+            raise HTTPError(400, "Content-Length must not be negative")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Request bodies are limited to {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length)
+    return Request(method.upper(), target, headers, body)
+
+
+def _head(status, content_type, extra=""):
+    return (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Connection: close\r\n{extra}\r\n").encode("latin-1")
+
+
+async def send_json(writer, status, payload):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    writer.write(_head(status, "application/json; charset=utf-8", f"Content-Length: {len(body)}\r\n") + body)
+    await writer.drain()
+
+
+class ChunkedResponse:
+    """Streams a text/plain body with chunked transfer encoding."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.started = False
+
+    async def write(self, text):
+        if not self.started:
+            self.writer.write(_head(200, "text/plain; charset=utf-8", "Transfer-Encoding: chunked\r\n"))
+            self.started = True
+        data = text.encode("utf-8")
+        if data:
+            self.writer.write(b"%X\r\n%s\r\n" % (len(data), data))
+            await self.writer.drain()
+
+    async def close(self):
+        await self.write("")
+        self.writer.write(b"0\r\n\r\n")
+        await self.writer.drain()
+
+
+def _text_field(data):
+    text = data.get("text")
+    if not isinstance(text, str) or not text.strip():
+        raise HTTPError(400, "'text' must be a non-empty string")
+    return text
+
+
+def _mode_field(data):
+    mode = data.get("mode", "speed")
+    if mode not in ("speed", "accuracy"):
+        raise HTTPError(400, "'mode' must be 'speed' or 'accuracy'")
+    return mode
+
+
+async def _preprocess_field(data, text):
+    """Cleans text up first when "preprocess" is true. Returns (text, stats or None)."""
+    if not data.get("preprocess"):
+        return text, None
+    text, stats = await asyncio.to_thread(text_preprocessor.preprocess_text, text)
+    if not text:
+        raise HTTPError(400, "Nothing is left of 'text' after preprocessing")
+    return text, dict(stats, tokens_saved=text_preprocessor.tokens_saved(stats))
+
+
+def _int_param(value, name, default):
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"'{name}' must be an integer")
+
+
+class ApiServer:
+    """Routes requests to the async engine and the history database. At most
+    max_concurrency summary/quiz requests talk to the model at once; the rest
+    wait their turn without holding a thread."""
+
+    def __init__(self, max_concurrency=16, api_key=None):
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.api_key = api_key
+        self.in_flight = 0
+
+    async def handle_connection(self, reader, writer):
+        try:
+            request = await read_request(reader)
+            if request is not None:
+                await self.dispatch(request, writer)
+        except HTTPError as e:
+            await send_json(writer, e.status, {"error": e.message})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            try:
+                await send_json(writer, 500, {"error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def dispatch(self, request, writer):
+        path = request.path
+        if path == "/health":
+            routes = {"GET": self.health}
+        elif path == "/summary":
+            routes = {"POST": self.summary}
+        elif path == "/quiz":
+            routes = {"POST": self.quiz}
+        elif path == "/estimate":
+            routes = {"POST": self.estimate}
+        elif path == "/history":
+            routes = {"GET": self.history}
+        elif path.startswith("/history/"):
+            routes = {"GET": self.history_record}
+        else:
+            raise HTTPError(404, f"No endpoint at {path}")
+        handler = routes.get(request.method)
+        if handler is None:
+            raise HTTPError(405, f"{request.method} is not supported on {path}")
+        await handler(request, writer)
+
+    def key_for(self, request, data):
+        return data.get("api_key") or request.headers.get("x-api-key") or self.api_key
+
+    async def health(self, request, writer):
+        await send_json(writer, 200, {"status": "ok", "in_flight": self.in_flight})
+
+    async def summary(self, request, writer):
+        """POST {"text", "mode", "chunked", "stream", "save", "preprocess"}: JSON
+        {"output", "saved", "preprocess"}, or the summary itself streamed as it is
+        generated when "stream" is true."""
+        data = request.json()
+        text = _text_field(data)
+        mode = _mode_field(data)
+        text, stats = await _preprocess_field(data, text)
+        stream = bool(data.get("stream", False))
+        response = ChunkedResponse(writer) if stream else None
+        streamed = []
+
+        async def on_chunk(piece):
+            streamed.append(piece)
+            await response.write(piece)
+
+        async with self.slots:
+            self.in_flight += 1
+            try:
+                output = await async_engine.run_task_async(
+                    text, mode, "summary", self.key_for(request, data),
+                    chunked=bool(data.get("chunked", True)), use_cache=bool(data.get("use_cache", True)),
+                    on_chunk=on_chunk if stream else None
+                )
+            except summarizer_logic.MissingApiKeyError as e:
+                return await self.fail(writer, response, 400, str(e))
+            except ConnectionError:
+                raise
+            except Exception as e:
+                return await self.fail(writer, response, 502, f"API Error: {e}")
+            finally:
+                self.in_flight -= 1
+
+        if data.get("save"):
+            await asyncio.to_thread(database_manager.save_summary_record, text, output, f"{mode} | Summary", "api")
+        if not stream:
+            return await send_json(writer, 200, {"output": output, "saved": bool(data.get("save")),
+                                                 "preprocess": stats})
+        # Cache hits arrive in one piece; notes are appended after the stream.
+        sent = "".join(streamed)
+        if not output.startswith(sent):
+            # Sending output now would repeat what the client already has.
+            return await self.fail(writer, response, 500, "The summary changed while it was streamed")
+        await response.write(output[len(sent):])
+        await response.close()
+
+    async def quiz(self, request, writer):
+        """POST {"text", "mode", "num_questions", "difficulty", "save", "preprocess"}:
+        JSON {"questions", "output", "notes", "record_id", "preprocess"}."""
+        data = request.json()
+        text = _text_field(data)
+        mode = _mode_field(data)
+        text, stats = await _preprocess_field(data, text)
+        num_questions = _int_param(data.get("num_questions"), "num_questions", 5)
+        if not 1 <= num_questions <= quiz_engine.MAX_QUESTIONS:
+            raise HTTPError(400, f"'num_questions' must be between 1 and {quiz_engine.MAX_QUESTIONS}")
+        difficulty = data.get("difficulty", "Medium")
+        if difficulty not in ("Easy", "Medium", "Hard", "Expert"):
+            raise HTTPError(400, "'difficulty' must be Easy, Medium, Hard or Expert")
+
+        async with self.slots:
+            self.in_flight += 1
+            try:
+                questions, notes = await quiz_engine.generate_quiz_async(
+                    text, mode, self.key_for(request, data), num_questions, difficulty,
+                    use_cache=bool(data.get("use_cache", True))
+                )
+            except summarizer_logic.MissingApiKeyError as e:
+                raise HTTPError(400, str(e))
+            except Exception as e:
+                raise HTTPError(502, f"API Error: {e}")
+            finally:
+                self.in_flight -= 1
+
+        output = quiz_engine.quiz_output(questions, notes)
+        record_id = None
+        if data.get("save"):
+            record_id = await asyncio.to_thread(
+                database_manager.save_quiz_record, text, output, questions, f"{mode} | Quiz", "api"
+            )
+        await send_json(writer, 200, {"questions": questions, "output": output, "notes": notes,
+                                      "record_id": record_id, "preprocess": stats})
+
+    async def estimate(self, request, writer):
+        """POST {"text", "mode", "task", "num_questions", "exact"}: the route and
+        estimated latency of a request, without running it. "exact" counts the
+        tokens with the API instead of estimating them."""
+        data = request.json()
+        text = _text_field(data)
+        mode = _mode_field(data)
+        task_type = data.get("task", "summary")
+        if task_type not in ("summary", "mcq"):
+            raise HTTPError(400, "'task' must be 'summary' or 'mcq'")
+        num_questions = _int_param(data.get("num_questions"), "num_questions", 5)
+        tokens = None
+        if data.get("exact"):
+            try:
+                api_key = summarizer_logic.resolve_api_key(self.key_for(request, data))
+                tokens = await asyncio.to_thread(
+                    token_budget.count_tokens, text, summarizer_logic.model_for_mode(mode), api_key
+                )
+            except summarizer_logic.MissingApiKeyError as e:
+                raise HTTPError(400, str(e))
+            except Exception as e:
+                raise HTTPError(502, f"API Error: {e}")
+        route = token_budget.plan_route(len(text), mode, task_type, num_questions, tokens=tokens)
+        await send_json(writer, 200, dict(route.as_dict(), exact=tokens is not None))
+
+    async def fail(self, writer, response, status, message):
+        if response is None or not response.started:
+            return await send_json(writer, status, {"error": message})
+        # Headers are already out; report the error at the end of the stream.
+        await response.write(f"\n\n[error] {message}")
+        await response.close()
+
+    async def history(self, request, writer):
+        """GET ?limit=&before_id= for a page of previews, or ?q= to search."""
+        limit = max(1, min(500, _int_param(request.query.get("limit"), "limit", 100)))
+        query = request.query.get("q")
+        if query:
+            rows = await asyncio.to_thread(database_manager.search_history, query, limit)
+        else:
+            before_id = _int_param(request.query.get("before_id"), "before_id", None)
+            rows = await asyncio.to_thread(database_manager.get_history_page, limit, before_id)
+        records = [{"id": rec_id, "timestamp": timestamp, "input_preview": inp, "output_preview": out, "mode": mode}
+                   for rec_id, timestamp, inp, out, mode in rows]
+        await send_json(writer, 200, {"records": records})
+
+    async def history_record(self, request, writer):
+        record_id = _int_param(request.path.rsplit("/", 1)[1], "id", None)
+        row = await asyncio.to_thread(database_manager.get_record, record_id)
+        if row is None:
+            raise HTTPError(404, f"No history record {record_id}")
+        questions = await asyncio.to_thread(database_manager.get_quiz_questions, record_id)
+        rec_id, timestamp, input_text, output_text, mode = row
+        await send_json(writer, 200, {
+            "id": rec_id, "timestamp": timestamp, "input_text": input_text,
+            "output_text": output_text, "mode": mode, "questions": questions,
+        })
+
+
+async def serve(args):
+    api = ApiServer(args.max_concurrency, args.api_key)
+    server = await asyncio.start_server(api.handle_connection, args.host, args.port)
+    address = server.sockets[0].getsockname()
+    print(f"Serving on http://{address[0]}:{address[1]} "
+          f"(at most {args.max_concurrency} concurrent model requests)", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py serve",
+        description="Local HTTP API: POST /summary, POST /quiz, POST /estimate, GET /history, "
+                    "GET /history/<id>, GET /health."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-concurrency", type=int, default=16,
+                        help="Summary/quiz requests processed at once; later ones wait.")
+    parser.add_argument("--api-key", default=None,
+                        help="Default key when a request has none (defaults to GEMINI_API_KEY).")
+    parser.add_argument("--rpm", type=int, default=None, help="Requests-per-minute quota.")
+    parser.add_argument("--tpm", type=int, default=1000000, help="Tokens-per-minute quota (with --rpm).")
+    parser.add_argument("--hedge-after", type=float, default=None,
+                        help="Seconds after which a slow request is also sent to the fallback model.")
+    parser.add_argument("--token-budget", type=int, default=token_budget.TOKEN_BUDGET,
+                        help="Estimated input tokens above which accuracy mode uses the faster model.")
+    parser.add_argument("--fake-backend", action="store_true",
+                        help="Answer with the local stand-in model (fake_gemini) instead of the API.")
+    parser.add_argument("--fake-latency", type=float, default=0.5, help="Stand-in model latency, seconds.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.fake_backend:
+        import fake_gemini
+        fake_gemini.install(latency=args.fake_latency)
+        args.api_key = args.api_key or "fake"
+    else:
+        args.api_key = args.api_key or os.environ.get("GEMINI_API_KEY")
+        try:
+            gemini_client.check_sdk()
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+    if args.rpm:
+        rate_limiter.set_limits(args.rpm, args.tpm)
+    summarizer_logic.HEDGE_AFTER_SECONDS = args.hedge_after
+    token_budget.TOKEN_BUDGET = args.token_budget
+    database_manager.init_db()
+    token_budget.load_calibration()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
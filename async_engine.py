@@ -0,0 +1,222 @@
+"""Asyncio counterpart of summarizer_logic, built on the SDK's
+generate_content_async, so one event loop can serve many requests without a
+thread per request. Prompts, chunking, caching, retries and the circuit
+breakers are shared with the synchronous path."""
+import asyncio
+import inspect
+
+import gemini_client
+import metrics
+import rate_limiter
+import resilience
+import summarizer_logic
+from summarizer_logic import (
+    CHUNK_CHAR_LIMIT, FALLBACK_MODEL, MAX_CHUNK_WORKERS, MissingApiKeyError, add_fallback_note,
+    add_route_note, build_chunk_prompt, build_prompt, build_reduce_prompt, lookup_result, split_into_stable_chunks,
+    start_task, store_result,
+)
+from token_budget import estimate_tokens
+
+
+async def _emit(on_chunk, piece):
+    # on_chunk may be a plain function or a coroutine function.
+    result = on_chunk(piece)
+    if inspect.isawaitable(result):
+        await result
+
+
+async def _call_model_async(api_key, model_name, prompt, on_chunk=None, run=None, generation_config=None):
+    await rate_limiter.throttle_async(estimate_tokens(prompt))
+    model = gemini_client.get_model(api_key, model_name)
+    request_options = {"timeout": summarizer_logic.REQUEST_TIMEOUT}
+    started = asyncio.get_running_loop().time()
+    try:
+        if on_chunk is None:
+            response = await model.generate_content_async(
+                prompt, generation_config=generation_config, request_options=request_options
+            )
+            text = response.text
+            if run is not None:
+                run.mark_first_byte()
+                run.add_usage(response)
+            return text
+
+        parts = []
+        response = await model.generate_content_async(
+            prompt, stream=True, generation_config=generation_config, request_options=request_options
+        )
+        async for chunk in response:
+            try:
+                piece = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. safety metadata) carry nothing to show.
+                continue
+            if piece:
+                if run is not None:
+                    run.mark_first_byte()
+                parts.append(piece)
+                await _emit(on_chunk, piece)
+        if run is not None:
+            run.add_usage(response)
+        return "".join(parts)
+    finally:
+        metrics.record_timing("model.call", asyncio.get_running_loop().time() - started)
+
+
+async def _resilient_call_async(api_key, model_name, prompt, on_chunk=None, run=None, generation_config=None):
+    streamed = []
+
+    async def track(piece):
+        streamed.append(piece)
+        await _emit(on_chunk, piece)
+
+    def should_retry(error):
+        # Once text has reached the client, retrying would duplicate it.
+        return not streamed and resilience.is_retryable(error)
+
+    return await resilience.call_with_breaker_async(model_name, lambda: resilience.call_with_retry_async(
+        lambda: _call_model_async(api_key, model_name, prompt, track if on_chunk else None, run, generation_config),
+        retries=summarizer_logic.MAX_RETRIES, should_retry=should_retry
+    ))
+
+
+async def generate_async(api_key, prompt, target_model, on_chunk=None, run=None, generation_config=None):
+    """Async summarizer_logic._generate: returns (text, used_fallback)."""
+    hedge_after = summarizer_logic.HEDGE_AFTER_SECONDS
+    if on_chunk is None and hedge_after is not None:
+        text, used_fallback = await resilience.hedged_call_async(
+            lambda: _resilient_call_async(api_key, target_model, prompt, run=run,
+                                          generation_config=generation_config),
+            lambda: _resilient_call_async(api_key, FALLBACK_MODEL, prompt, run=run,
+                                          generation_config=generation_config),
+            hedge_after
+        )
+    else:
+        streamed = []
+
+        async def track(piece):
+            streamed.append(piece)
+            await _emit(on_chunk, piece)
+
+        try:
+            text = await _resilient_call_async(
+                api_key, target_model, prompt, track if on_chunk else None, run, generation_config
+            )
+            used_fallback = False
+        except Exception:
+            if streamed:
+                # The client already has part of this answer; the fallback's
+                # would be appended to it.
+                raise
+            text = await _resilient_call_async(api_key, FALLBACK_MODEL, prompt, on_chunk, run, generation_config)
+            used_fallback = True
+    if used_fallback and run is not None:
+        run.fallback_used = True
+    return text, used_fallback
+
+
+async def _summarize_chunked_async(api_key, input_text, mode, target_model, max_chars, max_workers,
+                                   use_cache=True, on_chunk=None, run=None):
+    """Async summarizer_logic._summarize_chunked; at most max_workers calls
+    of one request are in flight at a time."""
+    limit = asyncio.Semaphore(max_workers)
+
+    async def cached_generate(kind, source_text, prompt):
+        key, cached = await asyncio.to_thread(
+            summarizer_logic._lookup_partial, use_cache, source_text, mode, kind, target_model
+        )
+        if cached is not None:
+            return cached, False
+        async with limit:
+            text, fallback = await generate_async(api_key, prompt, target_model, run=run)
+        await asyncio.to_thread(summarizer_logic._store_partial, key, text, fallback)
+        return text, fallback
+
+    chunks = split_into_stable_chunks(input_text, max_chars)
+    total = len(chunks)
+    results = await asyncio.gather(*[
+        cached_generate("summary-chunk", chunk, build_chunk_prompt(chunk, i + 1, total))
+        for i, chunk in enumerate(chunks)
+    ])
+    used_fallback = any(fallback for _, fallback in results)
+    summaries = [text for text, _ in results]
+
+    while len(summaries) > 1:
+        groups = summarizer_logic._group_summaries(summaries, max_chars)
+        if len(groups) == 1:
+            text, fallback = await generate_async(api_key, build_reduce_prompt(groups[0]), target_model, on_chunk, run)
+            return text, used_fallback or fallback
+        results = await asyncio.gather(*[
+            cached_generate("summary-merge", "\n\n---\n\n".join(group), build_reduce_prompt(group))
+            for group in groups
+        ])
+        used_fallback = used_fallback or any(fallback for _, fallback in results)
+        summaries = [text for text, _ in results]
+
+    return summaries[0], used_fallback
+
+
+async def run_task_async(input_text, mode="speed", task_type="summary", api_key=None, num_questions=5,
+                         difficulty="Medium", chunked=False, max_chunk_chars=CHUNK_CHAR_LIMIT,
+                         max_workers=MAX_CHUNK_WORKERS, use_cache=True, on_chunk=None, auto_route=True):
+    """Async summarizer_logic.run_task; on_chunk may be a coroutine function."""
+    active_key, target_model, chunked, route, run = start_task(
+        input_text, mode, task_type, api_key, num_questions, chunked, max_chunk_chars, max_workers, auto_route
+    )
+    started = asyncio.get_running_loop().time()
+    try:
+        text = await _execute_async(
+            run, active_key, input_text, mode, task_type, target_model, num_questions, difficulty,
+            chunked, max_chunk_chars, max_workers, use_cache, on_chunk
+        )
+    except Exception:
+        await asyncio.to_thread(run.finish, "error")
+        raise
+    finally:
+        metrics.record_timing("process_text", asyncio.get_running_loop().time() - started)
+    # finish() writes the run to the history database.
+    await asyncio.to_thread(run.finish)
+    return add_route_note(text, route)
+
+
+async def _execute_async(run, active_key, input_text, mode, task_type, target_model, num_questions, difficulty,
+                         chunked, max_chunk_chars, max_workers, use_cache, on_chunk):
+    # The cache is SQLite; its reads and writes stay off the event loop.
+    cache_key, cached = await asyncio.to_thread(
+        lookup_result, run, use_cache, input_text, mode, task_type, num_questions, difficulty, target_model
+    )
+    if cached is not None:
+        return cached
+
+    if task_type == "mcq":
+        import quiz_engine
+        questions, used_fallback = await quiz_engine.generate_questions_async(
+            active_key, input_text, target_model, num_questions, difficulty, run=run
+        )
+        text = quiz_engine.quiz_output(questions, quiz_engine.shortfall_notes(questions, num_questions))
+    elif chunked and task_type == "summary" and len(input_text) > max_chunk_chars:
+        text, used_fallback = await _summarize_chunked_async(
+            active_key, input_text, mode, target_model, max_chunk_chars, max_workers, use_cache, on_chunk, run
+        )
+    else:
+        prompt = build_prompt(input_text)
+        text, used_fallback = await generate_async(active_key, prompt, target_model, on_chunk, run)
+
+    text = add_fallback_note(text, used_fallback)
+    await asyncio.to_thread(store_result, cache_key, text, used_fallback)
+    return text
+
+
+async def process_text_async(input_text, mode="speed", task_type="summary", api_key=None, num_questions=5,
+                             difficulty="Medium", chunked=False, max_chunk_chars=CHUNK_CHAR_LIMIT,
+                             max_workers=MAX_CHUNK_WORKERS, use_cache=True, on_chunk=None, auto_route=True):
+    try:
+        return await run_task_async(
+            input_text, mode, task_type, api_key, num_questions, difficulty,
+            chunked=chunked, max_chunk_chars=max_chunk_chars, max_workers=max_workers,
+            use_cache=use_cache, on_chunk=on_chunk, auto_route=auto_route
+        )
+    except MissingApiKeyError as e:
+        return f"Error: {e}"
+    except Exception as e:
+        return f"API Error: {str(e)}"
@@ -0,0 +1,170 @@
+import argparse
+import datetime
+import glob
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import quiz_engine
+import rate_limiter
+import summarizer_logic
+import text_preprocessor
+import token_budget
+from database_manager import init_db, save_summary_record, save_quiz_record, has_source
+from document_handler import extract_text
+from extraction_cache import file_hash
+
+SUPPORTED_EXTENSIONS = ('.txt', '.pdf', '.docx')
+TASK_LABELS = {"summary": "Summary", "mcq": "Quiz"}
+
+
+def collect_files(targets):
+    """Expands directories (recursively) and glob patterns into supported files."""
+    files = []
+    for target in targets:
+        if os.path.isdir(target):
+            for root, _, names in os.walk(target):
+                files.extend(os.path.join(root, name) for name in sorted(names))
+        else:
+            files.extend(sorted(glob.glob(target, recursive=True)))
+    seen = set()
+    result = []
+    for path in files:
+        path = os.path.abspath(path)
+        if path.lower().endswith(SUPPORTED_EXTENSIONS) and path not in seen:
+            seen.add(path)
+            result.append(path)
+    return result
+
+
+def batch_source(content_hash, task_type, mode, num_questions, difficulty):
+    """History tag identifying one (document, settings) job, used to resume runs."""
+    if task_type == "mcq":
+        return f"batch:{content_hash}:{task_type}:{mode}:{num_questions}:{difficulty}"
+    return f"batch:{content_hash}:{task_type}:{mode}"
+
+
+class BatchRunner:
+    def __init__(self, args, output_file):
+        self.args = args
+        self.output_file = output_file
+        self.output_lock = threading.Lock()
+
+    def write_result(self, record):
+        with self.output_lock:
+            self.output_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.output_file.flush()
+
+    def run_job(self, file_path, task_type):
+        args = self.args
+        started = time.monotonic()
+        record = {
+            "file": file_path,
+            "task": task_type,
+            "mode": args.mode,
+            "timestamp": datetime.datetime.now().isoformat(),
+        }
+        try:
+            source = batch_source(file_hash(file_path), task_type, args.mode, args.num_questions, args.difficulty)
+            if not args.no_resume and has_source(source):
+                record["status"] = "skipped"
+                return record
+
+            text = extract_text(file_path)
+            if not args.no_preprocess:
+                text, stats = text_preprocessor.preprocess_text(text)
+                record["preprocess"] = dict(stats, tokens_saved=text_preprocessor.tokens_saved(stats))
+            if not text.strip():
+                raise Exception("No text could be extracted")
+
+            route = token_budget.plan_route(len(text), args.mode, task_type, args.num_questions)
+            record["route"] = route.as_dict()
+            label = f"{args.mode} | {TASK_LABELS[task_type]}"
+            if task_type == "mcq":
+                questions, notes = quiz_engine.generate_quiz(
+                    text, args.mode, args.api_key, args.num_questions, args.difficulty
+                )
+                output = quiz_engine.quiz_output(questions, notes)
+                save_quiz_record(text, output, questions, label, source)
+                record["questions"] = questions
+                record["notes"] = notes
+            else:
+                output = summarizer_logic.run_task(
+                    text, args.mode, task_type, args.api_key, chunked=True
+                )
+                save_summary_record(text, output, label, source)
+            record["status"] = "ok"
+            record["output"] = output
+        except Exception as e:
+            record["status"] = "error"
+            record["error"] = str(e)
+        record["elapsed"] = round(time.monotonic() - started, 3)
+        self.write_result(record)
+        return record
+
+    def run(self, files):
+        tasks = ["summary", "mcq"] if self.args.task == "both" else [self.args.task]
+        jobs = [(path, task) for path in files for task in tasks]
+        counts = {"ok": 0, "error": 0, "skipped": 0}
+
+        with ThreadPoolExecutor(max_workers=self.args.workers) as executor:
+            futures = [executor.submit(self.run_job, path, task) for path, task in jobs]
+            for done, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                counts[record["status"]] += 1
+                print(f"[{done}/{len(jobs)}] {record['status']:7} {record['task']:7} {record['file']}",
+                      file=sys.stderr)
+        return counts
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py batch",
+        description="Summarize or quiz many documents without the desktop UI."
+    )
+    parser.add_argument("targets", nargs="+", help="Directories, files or glob patterns to process.")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl", help="JSONL file results are appended to.")
+    parser.add_argument("--task", choices=["summary", "mcq", "both"], default="summary")
+    parser.add_argument("--mode", choices=["speed", "accuracy"], default="speed")
+    parser.add_argument("--num-questions", type=int, default=5)
+    parser.add_argument("--difficulty", choices=["Easy", "Medium", "Hard", "Expert"], default="Medium")
+    parser.add_argument("--api-key", default=None, help="Defaults to the GEMINI_API_KEY environment variable.")
+    parser.add_argument("--workers", type=int, default=8, help="Documents processed concurrently.")
+    parser.add_argument("--rpm", type=int, default=15, help="Requests-per-minute quota.")
+    parser.add_argument("--tpm", type=int, default=1000000, help="Tokens-per-minute quota.")
+    parser.add_argument("--hedge-after", type=float, default=None,
+                        help="Seconds after which a slow request is also sent to the fallback model.")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Reprocess documents already saved to history by an earlier run.")
+    parser.add_argument("--token-budget", type=int, default=token_budget.TOKEN_BUDGET,
+                        help="Estimated input tokens above which accuracy mode uses the faster model.")
+    parser.add_argument("--no-preprocess", action="store_true",
+                        help="Send extracted text as is, without removing headers/footers, "
+                             "hyphenation, extra whitespace and duplicate paragraphs.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    files = collect_files(args.targets)
+    if not files:
+        print("No .txt, .pdf or .docx files found.", file=sys.stderr)
+        return 1
+
+    init_db()
+    token_budget.TOKEN_BUDGET = args.token_budget
+    token_budget.load_calibration()
+    rate_limiter.set_limits(args.rpm, args.tpm)
+    summarizer_logic.HEDGE_AFTER_SECONDS = args.hedge_after
+    with open(args.output, "a", encoding="utf-8") as output_file:
+        counts = BatchRunner(args, output_file).run(files)
+    print(f"Done: {counts['ok']} ok, {counts['error']} failed, {counts['skipped']} skipped. "
+          f"Results in {args.output}", file=sys.stderr)
+    return 0 if counts["error"] == 0 else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
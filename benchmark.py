@@ -0,0 +1,309 @@
+"""Offline benchmarks: process_text against the fake_gemini stand-in,
+extraction of generated PDF/DOCX files, and database throughput.
+
+    python benchmark.py --output new.json --compare old.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import database_manager
+import document_handler
+import extraction_cache
+import fake_gemini
+import result_cache
+import summarizer_logic
+import text_preprocessor
+
+WORDS = ("lecture notes photosynthesis chlorophyll energy light reaction cell membrane protein "
+         "enzyme substrate history revolution economy market supply demand theorem proof lemma "
+         "algorithm complexity graph vertex edge").split()
+
+
+def synthetic_text(n_chars, rng):
+    paragraphs = []
+    total = 0
+    while total < n_chars:
+        sentence_count = rng.randint(3, 7)
+        paragraph = " ".join(
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 16))).capitalize() + "."
+            for _ in range(sentence_count)
+        )
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return "\n\n".join(paragraphs)[:n_chars]
+
+
+def write_synthetic_pdf(path, pages, rng, lines_per_page=40, running_headers=False):
+    """Writes a minimal text-layer PDF (Helvetica, one content stream per page),
+    optionally with a running header and a page number footer on every page."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for number in range(1, pages + 1):
+        lines = []
+        if running_headers:
+            lines.append("(Synthetic Benchmark Report - Internal Draft) Tj T* T*")
+        for _ in range(lines_per_page):
+            line = " ".join(rng.choice(WORDS) for _ in range(10))
+            lines.append("(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") Tj T*")
+        if running_headers:
+            lines.append(f"T* (Page {number} of {pages}) Tj")
+        stream = ("BT /F1 10 Tf 14 TL 50 760 Td " + " ".join(lines) + " ET").encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 3 0 R >> >> >>" % content_id
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % k for k in kids) + b"] /Count %d >>" % pages
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def write_synthetic_docx(path, pages, rng, paragraphs_per_page=8):
+    import docx
+    doc = docx.Document()
+    for _ in range(pages * paragraphs_per_page):
+        doc.add_paragraph(" ".join(rng.choice(WORDS) for _ in range(50)))
+    doc.save(path)
+
+
+class Recorder:
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def measure(self, suite, name, params, func, items=None, repeat=None):
+        """Times func() `repeat` times; items (e.g. rows or pages) gives a throughput figure."""
+        timings = []
+        extra = {}
+        for _ in range(repeat or self.repeat):
+            started = time.perf_counter()
+            value = func()
+            timings.append(time.perf_counter() - started)
+            if isinstance(value, dict):
+                extra = value
+        median = statistics.median(timings)
+        result = {
+            "suite": suite,
+            "name": name,
+            "params": params,
+            "runs": len(timings),
+            "median_s": round(median, 6),
+            "min_s": round(min(timings), 6),
+            "max_s": round(max(timings), 6),
+        }
+        if items:
+            result["items_per_s"] = round(items / median, 2) if median else None
+        result.update(extra)
+        self.results.append(result)
+        print(f"  {suite:8} {name:28} {json.dumps(params):50} median {median * 1000:10.2f} ms", file=sys.stderr)
+        return result
+
+
+def bench_process_text(recorder, args, rng):
+    fake_gemini.install(latency=args.latency, chunk_size=args.chunk_size,
+                        error_rate=args.error_rate, seed=args.seed)
+    sizes = [1000, 100000] if args.quick else [1000, 100000, 1000000]
+    for size in sizes:
+        text = synthetic_text(size, rng)
+        for chunked in (False, True):
+            params = {"chars": size, "chunked": chunked, "latency": args.latency, "error_rate": args.error_rate}
+            recorder.measure("process", "process_text", params, lambda: summarizer_logic.process_text(
+                text, api_key="benchmark", chunked=chunked, use_cache=False
+            ))
+
+        first_chunk = {}
+
+        def streamed():
+            started = time.perf_counter()
+            first_chunk.clear()
+
+            def on_chunk(piece):
+                first_chunk.setdefault("ttfb_s", round(time.perf_counter() - started, 6))
+
+            summarizer_logic.process_text(text, api_key="benchmark", use_cache=False, on_chunk=on_chunk)
+            return dict(first_chunk)
+
+        recorder.measure("process", "process_text_streamed",
+                         {"chars": size, "latency": args.latency, "chunk_size": args.chunk_size}, streamed)
+
+        summarizer_logic.process_text(text, api_key="benchmark")
+        recorder.measure("process", "process_text_cache_hit", {"chars": size},
+                         lambda: summarizer_logic.process_text(text, api_key="benchmark"))
+
+        if size > summarizer_logic.CHUNK_CHAR_LIMIT:
+            # Re-run after a small edit: only the changed chunk and the merges are regenerated.
+            # (The unedited text is already a whole-result cache hit, so warm up with an edit too.)
+            summarizer_logic.process_text("Edited paragraph.\n\n" + text, api_key="benchmark", chunked=True)
+            edits = iter(range(10 ** 6))
+            recorder.measure("process", "process_text_incremental", {"chars": size, "latency": args.latency},
+                             lambda: summarizer_logic.process_text(
+                                 f"Edited paragraph {next(edits)}.\n\n" + text, api_key="benchmark", chunked=True
+                             ))
+    fake_gemini.uninstall()
+
+
+def bench_extraction(recorder, args, rng, workdir):
+    page_counts = [1, 10, 100] if args.quick else [1, 10, 100, 1000]
+    for pages in page_counts:
+        pdf_path = os.path.join(workdir, f"synthetic_{pages}.pdf")
+        write_synthetic_pdf(pdf_path, pages, rng)
+        recorder.measure("extract", "extract_text_from_pdf", {"pages": pages},
+                         lambda: document_handler.extract_text_from_pdf(pdf_path), items=pages,
+                         repeat=1 if pages >= 1000 else None)
+        document_handler.extract_text(pdf_path)
+        recorder.measure("extract", "extract_text_cached_pdf", {"pages": pages},
+                         lambda: document_handler.extract_text(pdf_path), items=pages)
+
+        headed_path = os.path.join(workdir, f"synthetic_headers_{pages}.pdf")
+        write_synthetic_pdf(headed_path, pages, rng, running_headers=True)
+        headed_text = document_handler.extract_text(headed_path)
+
+        def preprocess():
+            _, stats = text_preprocessor.preprocess_text(headed_text)
+            return {"chars_saved": stats["chars_before"] - stats["chars_after"],
+                    "tokens_saved": text_preprocessor.tokens_saved(stats)}
+
+        recorder.measure("extract", "preprocess_pdf_text", {"pages": pages}, preprocess, items=pages)
+
+        try:
+            docx_path = os.path.join(workdir, f"synthetic_{pages}.docx")
+            write_synthetic_docx(docx_path, pages, rng)
+        except ImportError:
+            continue
+        recorder.measure("extract", "extract_text_from_docx", {"pages": pages},
+                         lambda: document_handler.extract_text_from_docx(docx_path), items=pages,
+                         repeat=1 if pages >= 1000 else None)
+
+
+def bench_database(recorder, args, rng):
+    row_counts = [1000, 10000] if args.quick else [1000, 10000, 100000]
+    batch_size = 1000
+    for rows in row_counts:
+        database_manager.DB_NAME = os.path.join(args.workdir, f"bench_{rows}.db")
+        database_manager.init_db()
+        records = [(synthetic_text(500, rng), synthetic_text(200, rng), "speed | Summary") for _ in range(rows)]
+
+        def insert_all():
+            for start in range(0, rows, batch_size):
+                database_manager.save_summary_records(records[start:start + batch_size])
+
+        recorder.measure("db", "insert_batched", {"rows": rows, "batch": batch_size}, insert_all,
+                         items=rows, repeat=1)
+        recorder.measure("db", "insert_single", {"rows": rows},
+                         lambda: database_manager.save_summary_record(*records[0]), repeat=50)
+
+        total_rows = rows + 50
+        recorder.measure("db", "history_first_page", {"rows": total_rows},
+                         lambda: database_manager.get_history_page(100))
+        middle_id = total_rows // 2
+        recorder.measure("db", "history_deep_page", {"rows": total_rows},
+                         lambda: database_manager.get_history_page(100, middle_id))
+        ids = [rng.randint(1, rows) for _ in range(100)]
+        recorder.measure("db", "get_record_x100", {"rows": total_rows},
+                         lambda: [database_manager.get_record(rec_id) for rec_id in ids], items=100)
+        recorder.measure("db", "search_history", {"rows": total_rows, "query": "chlorophyll enzyme"},
+                         lambda: database_manager.search_history("chlorophyll enzyme"))
+        recorder.measure("db", "storage", {"rows": total_rows}, database_manager.get_storage_stats, repeat=1)
+        database_manager.close_connection()
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {
+        (r["suite"], r["name"], json.dumps(r["params"], sort_keys=True)): r for r in baseline["results"]
+    }
+    print(f"\nComparison with {baseline_path} (ratio < 1.0 is faster):", file=sys.stderr)
+    for result in results:
+        key = (result["suite"], result["name"], json.dumps(result["params"], sort_keys=True))
+        old = previous.get(key)
+        if old and old["median_s"]:
+            ratio = result["median_s"] / old["median_s"]
+            flag = "  REGRESSION" if ratio > 1.2 else ""
+            print(f"  {result['suite']:8} {result['name']:28} {json.dumps(result['params']):50} "
+                  f"x{ratio:6.2f}{flag}", file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Offline benchmarks using a local Gemini stand-in.")
+    parser.add_argument("--suites", default="process,extract,db",
+                        help="Comma-separated subset of: process, extract, db.")
+    parser.add_argument("--quick", action="store_true", help="Skip the largest sizes.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (median is reported).")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake model latency per call, seconds.")
+    parser.add_argument("--chunk-size", type=int, default=40, help="Characters per streamed fake chunk.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake calls that fail with 503.")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="-", help="JSON results file ('-' for stdout).")
+    parser.add_argument("--compare", default=None, help="Earlier JSON results to compare against.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    suites = set(args.suites.split(","))
+    rng = random.Random(args.seed)
+    recorder = Recorder(args.repeat)
+
+    with tempfile.TemporaryDirectory(prefix="summarizer_bench_") as workdir:
+        args.workdir = workdir
+        # Keep every database and cache the benchmark touches out of the user's files.
+        database_manager.DB_NAME = os.path.join(workdir, "app_history.db")
+        database_manager.init_db()
+        result_cache.CACHE_DB_NAME = os.path.join(workdir, "result_cache.db")
+        extraction_cache.CACHE_DIR = os.path.join(workdir, "extraction_cache")
+
+        if "process" in suites:
+            bench_process_text(recorder, args, rng)
+        if "extract" in suites:
+            bench_extraction(recorder, args, rng, workdir)
+        if "db" in suites:
+            bench_database(recorder, args, rng)
+        database_manager.close_connection()
+
+    report = {
+        "timestamp": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "options": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "workdir")},
+        "results": recorder.results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(recorder.results, args.compare)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
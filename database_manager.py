@@ -1,46 +1,516 @@
+import os
+import re
+import json
+import zlib
 import sqlite3
+import hashlib
 import datetime
+import threading
+from contextlib import contextmanager
+
+from metrics import timed, percentile
 
 DB_NAME = "app_history.db"
 
+# One long-lived connection per thread; sqlite3 connections must not be
+# shared across threads, and reopening per call costs far more than the query.
+_local = threading.local()
+
+def _get_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.db_name == DB_NAME:
+        return conn
+    if conn is not None:
+        conn.close()
+    conn = sqlite3.connect(DB_NAME, timeout=30)
+    # WAL lets readers (the UI) proceed while a write is in progress.
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-16000')
+    conn.execute('PRAGMA busy_timeout=30000')
+    # Used by the chat_history_text view (and so the search index) to read blobs.
+    conn.create_function('inflate', 1, _inflate, deterministic=True)
+    _local.conn = conn
+    _local.db_name = DB_NAME
+    return conn
+
+def close_connection():
+    """Closes the calling thread's connection, if any."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+@contextmanager
+def transaction():
+    """Yields a cursor; everything done with it is committed as one transaction."""
+    conn = _get_connection()
+    with conn:
+        yield conn.cursor()
+
+def _inflate(data):
+    return None if data is None else zlib.decompress(data).decode('utf-8')
+
+@timed('db.init_db')
 def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+    with transaction() as cursor:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS chat_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT,
+                input_text TEXT,
+                output_text TEXT,
+                mode TEXT
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_history_timestamp ON chat_history (timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_history_mode ON chat_history (mode)')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS run_metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT,
+                model TEXT,
+                task_type TEXT,
+                mode TEXT,
+                bytes_in INTEGER,
+                tokens_in INTEGER,
+                tokens_out INTEGER,
+                calls INTEGER,
+                ttfb_ms REAL,
+                total_ms REAL,
+                cache_hit INTEGER,
+                fallback_used INTEGER,
+                status TEXT
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_run_metrics_group ON run_metrics (model, task_type)')
+        _add_column(cursor, 'chat_history', 'source', 'TEXT')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_history_source ON chat_history (source)')
+        # Inputs and outputs live once each in blobs, zlib-compressed and keyed by
+        # their SHA-256; chat_history keeps only the hashes and short previews.
+        # input_text/output_text remain only so older databases can be migrated.
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                size INTEGER,
+                data BLOB
+            )
+        ''')
+        _add_column(cursor, 'chat_history', 'input_hash', 'TEXT')
+        _add_column(cursor, 'chat_history', 'output_hash', 'TEXT')
+        _add_column(cursor, 'chat_history', 'input_preview', 'TEXT')
+        _add_column(cursor, 'chat_history', 'output_preview', 'TEXT')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_history_input_hash ON chat_history (input_hash)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_history_output_hash ON chat_history (output_hash)')
+        _drop_legacy_fts(cursor)
+        _migrate_inline_text(cursor)
+        _init_fts(cursor)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS quiz_questions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                record_id INTEGER,
+                position INTEGER,
+                question TEXT,
+                options TEXT,
+                answer INTEGER,
+                explanation TEXT
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_quiz_questions_record ON quiz_questions (record_id, position)')
+
+def _add_column(cursor, table, column, column_type):
+    """Adds a column to databases created by older versions of the app."""
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}')
+
+def _drop_legacy_fts(cursor):
+    """Drops the FTS index older versions built directly over chat_history's text columns."""
+    for trigger in ('chat_history_fts_insert', 'chat_history_fts_delete', 'chat_history_fts_update'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    cursor.execute('DROP TABLE IF EXISTS chat_history_fts')
+
+MIGRATION_BATCH = 500
+
+def _migrate_inline_text(cursor):
+    """Moves text stored inline by older versions into blobs."""
+    while True:
+        cursor.execute('''
+            SELECT id, input_text, output_text FROM chat_history
+            WHERE input_hash IS NULL AND (input_text IS NOT NULL OR output_text IS NOT NULL)
+            LIMIT ?
+        ''', (MIGRATION_BATCH,))
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        for rec_id, input_text, output_text in rows:
+            cursor.execute('''
+                UPDATE chat_history
+                SET input_hash = ?, output_hash = ?, input_preview = ?, output_preview = ?,
+                    input_text = NULL, output_text = NULL
+                WHERE id = ?
+            ''', (_store_blob(cursor, input_text or ""), _store_blob(cursor, output_text),
+                  _preview_prefix(input_text), _preview_prefix(output_text), rec_id))
+
+def _init_fts(cursor):
+    """Creates the FTS5 index over the history text. The index keeps its own
+    copy of the text, so searches and snippets never decompress blobs. It is
+    kept up to date by the functions here that save and delete records (see
+    _index_record and _unindex_records), not by triggers: a trigger would need
+    inflate(), which other SQLite clients don't have, so any write to
+    chat_history from outside the app would fail."""
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS chat_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            input_text TEXT,
-            output_text TEXT,
-            mode TEXT
+        CREATE VIEW IF NOT EXISTS chat_history_text AS
+        SELECT h.id, h.timestamp, inflate(bi.data) AS input_text, inflate(bo.data) AS output_text, h.mode
+        FROM chat_history h
+        LEFT JOIN blobs bi ON bi.hash = h.input_hash
+        LEFT JOIN blobs bo ON bo.hash = h.output_hash
+    ''')
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'history_fts'")
+    row = cursor.fetchone()
+    exists = row is not None
+    for trigger in ('history_fts_insert', 'history_fts_delete', 'history_fts_update'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    if exists and "content='chat_history_text'" in row[0]:
+        # Older versions indexed the view, so every snippet inflated whole blobs.
+        cursor.execute('DROP TABLE history_fts')
+        exists = False
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+            input_text, output_text, prefix='2 3',
+            tokenize='unicode61 remove_diacritics 2'
         )
     ''')
-    conn.commit()
-    conn.close()
+    if not exists:
+        # New or migrated databases: index the rows saved before the index existed.
+        _index_missing(cursor)
+
+def _index_record(cursor, record_id, input_text, output_text):
+    cursor.execute('INSERT INTO history_fts (rowid, input_text, output_text) VALUES (?, ?, ?)',
+                   (record_id, input_text, output_text))
+
+def _index_missing(cursor):
+    cursor.execute('''
+        INSERT INTO history_fts (rowid, input_text, output_text)
+        SELECT id, input_text, output_text FROM chat_history_text
+        WHERE id NOT IN (SELECT rowid FROM history_fts)
+    ''')
+
+def _unindex_records(cursor, where, params=()):
+    """Removes the chat_history records matching where from the index. Must
+    run before the rows are deleted."""
+    cursor.execute(f'DELETE FROM history_fts WHERE rowid IN (SELECT id FROM chat_history WHERE {where})', params)
+
+def _store_blob(cursor, text):
+    """Stores text once under its SHA-256 and returns the hash (None for None)."""
+    if text is None:
+        return None
+    raw = text.encode('utf-8')
+    digest = hashlib.sha256(raw).hexdigest()
+    # One statement, so concurrent saves of the same text can't race on the key.
+    cursor.execute('INSERT OR IGNORE INTO blobs (hash, size, data) VALUES (?, ?, ?)',
+                   (digest, len(raw), zlib.compress(raw, 6)))
+    return digest
+
+def _delete_orphan_blobs(cursor, hashes=None):
+    """Removes blobs no record refers to any more; all of them when hashes is None."""
+    if hashes is None:
+        cursor.execute('''
+            DELETE FROM blobs WHERE hash NOT IN (
+                SELECT input_hash FROM chat_history WHERE input_hash IS NOT NULL
+                UNION
+                SELECT output_hash FROM chat_history WHERE output_hash IS NOT NULL
+            )
+        ''')
+        return
+    cursor.executemany('''
+        DELETE FROM blobs WHERE hash = ?
+        AND NOT EXISTS (SELECT 1 FROM chat_history WHERE input_hash = ?)
+        AND NOT EXISTS (SELECT 1 FROM chat_history WHERE output_hash = ?)
+    ''', [(h, h, h) for h in hashes if h is not None])
+
+def save_summary_record(input_text, output_text, mode, source=None):
+    save_summary_records([(input_text, output_text, mode)], source)
+
+@timed('db.save_summary_records')
+def save_summary_records(records, source=None):
+    """Inserts many (input_text, output_text, mode) tuples in one transaction.
+    source optionally tags where the records came from (e.g. a batch job)."""
+    timestamp = datetime.datetime.now().isoformat()
+    with transaction() as cursor:
+        for inp, out, mode in records:
+            cursor.execute('''
+                INSERT INTO chat_history (timestamp, input_hash, output_hash, input_preview, output_preview, mode, source)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (timestamp, _store_blob(cursor, inp), _store_blob(cursor, out),
+                  _preview_prefix(inp), _preview_prefix(out), mode, source))
+            _index_record(cursor, cursor.lastrowid, inp, out)
 
-def save_summary_record(input_text, output_text, mode):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+@timed('db.save_quiz_record')
+def save_quiz_record(input_text, output_text, questions, mode, source=None):
+    """Saves a quiz as a history record plus one quiz_questions row per
+    question dict (see quiz_engine.parse_questions). Returns the record id."""
     timestamp = datetime.datetime.now().isoformat()
+    with transaction() as cursor:
+        cursor.execute('''
+            INSERT INTO chat_history (timestamp, input_hash, output_hash, input_preview, output_preview, mode, source)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (timestamp, _store_blob(cursor, input_text), _store_blob(cursor, output_text),
+              _preview_prefix(input_text), _preview_prefix(output_text), mode, source))
+        record_id = cursor.lastrowid
+        _index_record(cursor, record_id, input_text, output_text)
+        cursor.executemany('''
+            INSERT INTO quiz_questions (record_id, position, question, options, answer, explanation)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(record_id, position, q["question"], json.dumps(q["options"], ensure_ascii=False),
+               q["answer"], q.get("explanation", "")) for position, q in enumerate(questions)])
+    return record_id
+
+@timed('db.get_quiz_questions')
+def get_quiz_questions(record_id):
+    """Returns the question dicts saved with a quiz record, in order (empty for other records)."""
+    cursor = _get_connection().cursor()
+    cursor.execute('''
+        SELECT question, options, answer, explanation FROM quiz_questions
+        WHERE record_id = ? ORDER BY position
+    ''', (record_id,))
+    return [{"question": question, "options": json.loads(options), "answer": answer, "explanation": explanation}
+            for question, options, answer, explanation in cursor.fetchall()]
+
+@timed('db.has_source')
+def has_source(source):
+    """True if a record tagged with source has already been saved."""
+    cursor = _get_connection().cursor()
+    cursor.execute('SELECT 1 FROM chat_history WHERE source = ? LIMIT 1', (source,))
+    return cursor.fetchone() is not None
+
+PREVIEW_CHARS = 50
+
+def _preview_prefix(text):
+    # One character more than shown, enough to know whether to add '...'.
+    return None if text is None else text[:PREVIEW_CHARS + 1]
+
+def _preview(text):
+    if text is None:
+        return ""
+    return (text[:PREVIEW_CHARS] + '...') if len(text) > PREVIEW_CHARS else text
+
+@timed('db.get_history_page')
+def get_history_page(limit=100, before_id=None):
+    """Returns one page of (id, timestamp, input_preview, output_preview, mode)
+    rows, newest first. Pass the last id of the previous page as before_id."""
+    cursor = _get_connection().cursor()
+    query = '''
+        SELECT id, timestamp, input_preview, output_preview, mode
+        FROM chat_history
+        {where}
+        ORDER BY id DESC
+        LIMIT ?
+    '''
+    if before_id is None:
+        cursor.execute(query.format(where=''), (limit,))
+    else:
+        cursor.execute(query.format(where='WHERE id < ?'), (before_id, limit))
+    return [(rec_id, timestamp, _preview(inp), _preview(out), mode)
+            for rec_id, timestamp, inp, out, mode in cursor.fetchall()]
+
+@timed('db.get_record')
+def get_record(record_id):
+    """Returns the full (id, timestamp, input_text, output_text, mode) row, or None."""
+    cursor = _get_connection().cursor()
+    cursor.execute('SELECT id, timestamp, input_text, output_text, mode FROM chat_history_text WHERE id = ?', (record_id,))
+    return cursor.fetchone()
+
+def _fts_query(text):
+    """Turns free text into an FTS5 query: every word must match, the last
+    one as a prefix since the user may still be typing it."""
+    words = ['"{}"'.format(word) for word in re.findall(r'\w+', text)]
+    if words:
+        words[-1] += '*'
+    return ' '.join(words)
+
+# Search ranks only this many of the newest matches: scoring every match of a
+# common word across a large history costs more than the rest of the query.
+SEARCH_CANDIDATES = 1000
+
+@timed('db.search_history')
+def search_history(text, limit=100):
+    """Full-text search over saved records, best matches first (among the
+    newest SEARCH_CANDIDATES matches). Returns (id, timestamp, input_snippet,
+    output_snippet, mode) rows with matches wrapped in [brackets]."""
+    query = _fts_query(text)
+    if not query:
+        return []
+    cursor = _get_connection().cursor()
+    # FTS5 returns matches in rowid order, so the newest candidates are found
+    # without visiting the rest; snippets come from the index's own copy of the text.
     cursor.execute('''
-        INSERT INTO chat_history (timestamp, input_text, output_text, mode)
-        VALUES (?, ?, ?, ?)
-    ''', (timestamp, input_text, output_text, mode))
-    conn.commit()
-    conn.close()
+        SELECT h.id, h.timestamp, c.input_snippet, c.output_snippet, h.mode
+        FROM (
+            SELECT rowid AS id, bm25(history_fts) AS score,
+                   snippet(history_fts, 0, '[', ']', '...', 8) AS input_snippet,
+                   snippet(history_fts, 1, '[', ']', '...', 8) AS output_snippet
+            FROM history_fts
+            WHERE history_fts MATCH ?
+            ORDER BY rowid DESC
+            LIMIT ?
+        ) c
+        JOIN chat_history h ON h.id = c.id
+        ORDER BY c.score
+        LIMIT ?
+    ''', (query, SEARCH_CANDIDATES, limit))
+    return cursor.fetchall()
 
+@timed('db.get_history')
 def get_history():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM chat_history ORDER BY id DESC')
-    records = cursor.fetchall()
-    conn.close()
-    return records
+    cursor = _get_connection().cursor()
+    cursor.execute('SELECT id, timestamp, input_text, output_text, mode FROM chat_history_text ORDER BY id DESC')
+    return cursor.fetchall()
 
 def delete_record(record_id):
     """Deletes a specific record by ID."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM chat_history WHERE id = ?', (record_id,))
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    delete_records([record_id])
+
+@timed('db.delete_records')
+def delete_records(record_ids):
+    """Deletes several records by ID in one transaction, along with any
+    stored text no other record shares."""
+    with transaction() as cursor:
+        hashes = set()
+        for rid in record_ids:
+            cursor.execute('SELECT input_hash, output_hash FROM chat_history WHERE id = ?', (rid,))
+            hashes.update(cursor.fetchone() or ())
+            _unindex_records(cursor, 'id = ?', (rid,))
+        cursor.executemany('DELETE FROM chat_history WHERE id = ?', [(rid,) for rid in record_ids])
+        cursor.executemany('DELETE FROM quiz_questions WHERE record_id = ?', [(rid,) for rid in record_ids])
+        _delete_orphan_blobs(cursor, hashes)
+
+@timed('db.prune_history')
+def prune_history(max_age_days=None, max_records=None):
+    """Retention: deletes records (and run metrics) older than max_age_days and
+    all but the newest max_records records. Returns the number of records deleted."""
+    deleted = 0
+    with transaction() as cursor:
+        if max_age_days is not None:
+            cutoff = (datetime.datetime.now() - datetime.timedelta(days=max_age_days)).isoformat()
+            _unindex_records(cursor, 'timestamp < ?', (cutoff,))
+            cursor.execute('DELETE FROM chat_history WHERE timestamp < ?', (cutoff,))
+            deleted += cursor.rowcount
+            cursor.execute('DELETE FROM run_metrics WHERE timestamp < ?', (cutoff,))
+        if max_records is not None:
+            older = '''id < (
+                SELECT COALESCE(MIN(id), 0) FROM (SELECT id FROM chat_history ORDER BY id DESC LIMIT ?)
+            )'''
+            _unindex_records(cursor, older, (max_records,))
+            cursor.execute(f'DELETE FROM chat_history WHERE {older}', (max_records,))
+            deleted += cursor.rowcount
+        if deleted:
+            cursor.execute('DELETE FROM quiz_questions WHERE record_id NOT IN (SELECT id FROM chat_history)')
+            _delete_orphan_blobs(cursor)
+    return deleted
+
+@timed('db.vacuum')
+def vacuum():
+    """Brings the search index back in line with records other tools added or
+    deleted, optimizes it and compacts the database file. Returns the file
+    size (bytes) before and after."""
+    size_before = _database_size()
+    conn = _get_connection()
+    with conn:
+        conn.execute('DELETE FROM history_fts WHERE rowid NOT IN (SELECT id FROM chat_history)')
+        _index_missing(conn.cursor())
+        conn.execute("INSERT INTO history_fts (history_fts) VALUES ('optimize')")
+    conn.execute('VACUUM')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    return size_before, _database_size()
+
+def _database_size():
+    return sum(os.path.getsize(path) for path in (DB_NAME, DB_NAME + '-wal') if os.path.exists(path))
+
+@timed('db.get_storage_stats')
+def get_storage_stats():
+    """Returns record and blob counts, the uncompressed and stored text sizes
+    and the database file size, all sizes in bytes."""
+    cursor = _get_connection().cursor()
+    cursor.execute('SELECT COUNT(*) FROM chat_history')
+    records = cursor.fetchone()[0]
+    cursor.execute('SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(length(data)), 0) FROM blobs')
+    blobs, text_bytes, stored_bytes = cursor.fetchone()
+    return {
+        "records": records,
+        "blobs": blobs,
+        "text_bytes": text_bytes,
+        "stored_bytes": stored_bytes,
+        "file_bytes": _database_size(),
+    }
+
+def save_run_metrics(run):
+    """Stores one metrics.RunMetrics row."""
+    with transaction() as cursor:
+        cursor.execute('''
+            INSERT INTO run_metrics (timestamp, model, task_type, mode, bytes_in, tokens_in, tokens_out, calls,
+                                     ttfb_ms, total_ms, cache_hit, fallback_used, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (datetime.datetime.now().isoformat(), run.model, run.task_type, run.mode, run.bytes_in,
+              run.tokens_in, run.tokens_out, run.calls, run.first_byte * 1000, run.total * 1000,
+              int(run.cache_hit), int(run.fallback_used), run.status))
+
+@timed('db.get_latency_samples')
+def get_latency_samples(limit=500):
+    """Returns (model, tokens_in, tokens_out, total_ms) of the most recent
+    successful single-call runs that reached the model."""
+    cursor = _get_connection().cursor()
+    cursor.execute('''
+        SELECT model, tokens_in, tokens_out, total_ms
+        FROM run_metrics
+        WHERE status = 'ok' AND cache_hit = 0 AND calls = 1 AND tokens_in > 0
+        ORDER BY id DESC
+        LIMIT ?
+    ''', (limit,))
+    return cursor.fetchall()
+
+@timed('db.get_run_metric_summary')
+def get_run_metric_summary(limit=5000):
+    """Aggregates the most recent runs per (model, task_type). Each entry is a
+    dict with run counts, cache hit rate, average tokens and latency percentiles (ms)."""
+    cursor = _get_connection().cursor()
+    cursor.execute('''
+        SELECT model, task_type, tokens_in, tokens_out, ttfb_ms, total_ms, cache_hit, fallback_used, status
+        FROM run_metrics
+        ORDER BY id DESC
+        LIMIT ?
+    ''', (limit,))
+    groups = {}
+    for model, task_type, tokens_in, tokens_out, ttfb, total, cache_hit, fallback, status in cursor.fetchall():
+        group = groups.setdefault((model, task_type), {
+            "model": model, "task_type": task_type, "runs": 0, "errors": 0, "cache_hits": 0,
+            "fallbacks": 0, "tokens_in": 0, "tokens_out": 0, "ttfb": [], "total": [],
+        })
+        group["runs"] += 1
+        group["errors"] += status != "ok"
+        group["cache_hits"] += cache_hit
+        group["fallbacks"] += fallback
+        group["tokens_in"] += tokens_in
+        group["tokens_out"] += tokens_out
+        group["ttfb"].append(ttfb)
+        group["total"].append(total)
+
+    summary = []
+    for group in groups.values():
+        runs = group["runs"]
+        summary.append({
+            "model": group["model"],
+            "task_type": group["task_type"],
+            "runs": runs,
+            "errors": group["errors"],
+            "cache_hit_rate": group["cache_hits"] / runs,
+            "fallbacks": group["fallbacks"],
+            "avg_tokens_in": group["tokens_in"] / runs,
+            "avg_tokens_out": group["tokens_out"] / runs,
+            "ttfb_p50": percentile(group["ttfb"], 0.5),
+            "total_p50": percentile(group["total"], 0.5),
+            "total_p90": percentile(group["total"], 0.9),
+            "total_p99": percentile(group["total"], 0.99),
+        })
+    return sorted(summary, key=lambda entry: (entry["model"], entry["task_type"]))
@@ -0,0 +1,44 @@
+import argparse
+import sys
+
+import database_manager
+
+
+def _mb(size):
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py vacuum",
+        description="Apply history retention and compact the history database."
+    )
+    parser.add_argument("--keep-days", type=int, default=None,
+                        help="Delete records and run metrics older than this many days.")
+    parser.add_argument("--keep-records", type=int, default=None,
+                        help="Keep only this many of the newest records.")
+    parser.add_argument("--db", default=None, help="History database (defaults to app_history.db).")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.db:
+        database_manager.DB_NAME = args.db
+    # Also migrates databases that still store text inline.
+    database_manager.init_db()
+
+    if args.keep_days is not None or args.keep_records is not None:
+        deleted = database_manager.prune_history(args.keep_days, args.keep_records)
+        print(f"Deleted {deleted} records.", file=sys.stderr)
+
+    size_before, size_after = database_manager.vacuum()
+    stats = database_manager.get_storage_stats()
+    print(f"{stats['records']} records, {stats['blobs']} stored texts: "
+          f"{_mb(stats['text_bytes'])} of text in {_mb(stats['stored_bytes'])}.", file=sys.stderr)
+    print(f"Database {_mb(size_before)} -> {_mb(size_after)}.", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
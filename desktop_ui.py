@@ -1,45 +1,240 @@
 import sys
 import os
+import time
+import importlib
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QTextEdit, QLabel, QRadioButton, QGroupBox, QSizePolicy, QScrollArea,
-    QPushButton, QFileDialog, QMessageBox, QDialog, QTableWidget, 
-    QTableWidgetItem, QHeaderView, QAbstractItemView, QLineEdit, QSplitter,
-    QSpinBox, QComboBox, QFormLayout
+    QPlainTextEdit, QLabel, QRadioButton, QGroupBox, QSizePolicy, QScrollArea,
+    QPushButton, QFileDialog, QMessageBox, QDialog, QTableView,
+    QHeaderView, QAbstractItemView, QLineEdit, QSplitter,
+    QSpinBox, QComboBox, QFormLayout, QProgressBar, QTableWidget, QTableWidgetItem, QCheckBox
+)
+from PyQt5.QtGui import QPalette, QColor, QFont, QTextCursor
+from PyQt5.QtCore import (
+    Qt, QThread, pyqtSignal, QObject, QAbstractTableModel, QModelIndex, QTimer, QRunnable, QThreadPool
 )
-from PyQt5.QtGui import QPalette, QColor, QFont
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QObject
 
-from summarizer_logic import process_text
-from document_handler import extract_text_from_pdf, extract_text_from_docx
-from database_manager import init_db, save_summary_record, get_history, delete_record
+# summarizer_logic, quiz_engine and document_handler (and the SDKs behind them)
+# are imported where first used, and preloaded by StartupWorker after the
+# window is up.
+from database_manager import (
+    init_db, close_connection, save_summary_record, save_quiz_record, get_history_page, get_record, delete_record,
+    search_history, get_run_metric_summary
+)
+import metrics
+import token_budget
 
-class AIWorker(QObject):
-    finished = pyqtSignal(str)
-    error = pyqtSignal(str)
+class AIJobSignals(QObject):
+    chunk = pyqtSignal(int, str)
+    started = pyqtSignal(int)
+    finished = pyqtSignal(int, str)
+    error = pyqtSignal(int, str)
 
-    def __init__(self, text, mode, task_type, api_key, num_questions=5, difficulty="Medium"):
+class AIJob(QRunnable):
+    """One process_text call, run on the shared QThreadPool."""
+    def __init__(self, job_id, text, mode, task_type, api_key, num_questions=5, difficulty="Medium"):
         super().__init__()
+        # The owning window keeps a reference until the job is done.
+        self.setAutoDelete(False)
+        self.job_id = job_id
         self.text = text
         self.mode = mode
         self.task_type = task_type
         self.api_key = api_key
         self.num_questions = num_questions
         self.difficulty = difficulty
+        self.signals = AIJobSignals()
+        # Structured questions of a finished quiz job, read by the window on finished.
+        self.questions = None
 
     def run(self):
+        from summarizer_logic import process_text
+        from quiz_engine import generate_quiz, quiz_output
+
+        self.signals.started.emit(self.job_id)
         try:
+            if self.task_type == "mcq":
+                self.questions, notes = generate_quiz(
+                    self.text, self.mode, self.api_key, self.num_questions, self.difficulty
+                )
+                self.signals.finished.emit(self.job_id, quiz_output(self.questions, notes))
+                return
             result = process_text(
                 self.text, 
                 self.mode, 
                 self.task_type, 
                 self.api_key, 
                 self.num_questions, 
-                self.difficulty
+                self.difficulty,
+                chunked=True,
+                on_chunk=lambda piece: self.signals.chunk.emit(self.job_id, piece)
             )
-            self.finished.emit(result)
+            self.signals.finished.emit(self.job_id, result)
+        except Exception as e:
+            self.signals.error.emit(self.job_id, str(e))
+
+class TokenCountSignals(QObject):
+    counted = pyqtSignal(int)
+    error = pyqtSignal(str)
+
+class TokenCountJob(QRunnable):
+    """Asks the API for the exact token count of the input."""
+    def __init__(self, text, mode, api_key):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.text = text
+        self.mode = mode
+        self.api_key = api_key
+        self.signals = TokenCountSignals()
+
+    def run(self):
+        from summarizer_logic import model_for_mode
+        try:
+            tokens = token_budget.count_tokens(self.text, model_for_mode(self.mode), self.api_key)
+            self.signals.counted.emit(tokens)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+
+class HistorySearchSignals(QObject):
+    found = pyqtSignal(int, list)
+    error = pyqtSignal(int, str)
+
+class HistorySearchJob(QRunnable):
+    """Runs one history search off the GUI thread; generation tells the
+    model which keystroke's search the rows belong to."""
+    def __init__(self, generation, text):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.generation = generation
+        self.text = text
+        self.signals = HistorySearchSignals()
+
+    def run(self):
+        try:
+            self.signals.found.emit(self.generation, search_history(self.text))
+        except Exception as e:
+            self.signals.error.emit(self.generation, str(e))
+
+class JobInfo:
+    """UI-side state of a queued, running or finished AIJob."""
+    def __init__(self, job_id, label, input_text, save_mode, runnable):
+        self.job_id = job_id
+        self.label = label
+        self.input_text = input_text
+        self.save_mode = save_mode
+        self.runnable = runnable
+        self.state = "Queued"
+        self.started_at = None
+        self.finished_at = None
+        self.streamed_text = ""
+        self.result = None
+        self.questions = None
+        self.saved = False
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def is_active(self):
+        return self.state in ("Queued", "Running")
+
+SUPPORTED_EXTENSIONS = ('.txt', '.pdf', '.docx')
+
+class DocumentLoaderWorker(QObject):
+    """Extracts (and, with preprocess, cleans up) a document off the GUI
+    thread, emitting its text in pieces."""
+    text_chunk = pyqtSignal(str)
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(str, str)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    # Pieces are batched so large files don't flood the event loop with signals.
+    EMIT_CHARS = 256 * 1024
+
+    def __init__(self, file_path, preprocess=True):
+        super().__init__()
+        self.file_path = file_path
+        self.preprocess = preprocess
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
+
+    def run(self):
+        pieces = None
+        pages = None
+        try:
+            from document_handler import PAGE_BREAK, iter_document
+            from text_preprocessor import PAGE_JOIN, clean_pages, describe_savings, new_stats, paragraph_blocks
+            separator, pieces = iter_document(self.file_path, progress=self.progress.emit)
+            paged = separator == PAGE_BREAK
+            stats = None
+            if self.preprocess:
+                # Without page breaks the document is cleaned up in paragraph-aligned blocks.
+                source = pieces if paged else paragraph_blocks(pieces, separator)
+                stats = new_stats()
+                pages = clean_pages(source, stats, paged)
+            join = PAGE_JOIN if self.preprocess or paged else separator
+            buffer = []
+            buffered = 0
+            first = True
+            for piece in pages if pages is not None else pieces:
+                if self.is_cancelled:
+                    break
+                if not first:
+                    buffer.append(join)
+                buffer.append(piece)
+                buffered += len(piece)
+                first = False
+                if buffered >= self.EMIT_CHARS:
+                    self.text_chunk.emit("".join(buffer))
+                    buffer = []
+                    buffered = 0
+            if self.is_cancelled:
+                self.cancelled.emit()
+                return
+            if buffer:
+                self.text_chunk.emit("".join(buffer))
+            self.finished.emit(self.file_path, describe_savings(stats) if stats is not None else "")
+        except Exception as e:
+            self.error.emit(str(e))
+        finally:
+            if pages is not None:
+                pages.close()
+            if pieces is not None:
+                pieces.close()
+
+class StartupWorker(QObject):
+    """Initializes (and migrates) the database, then preloads the heavy
+    modules, so neither delays the first window."""
+    db_ready = pyqtSignal()
+    error = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    PRELOAD_MODULES = (
+        "summarizer_logic", "quiz_engine", "document_handler", "pypdf", "docx", "google.generativeai"
+    )
+
+    def run(self):
+        try:
+            init_db()
+            token_budget.load_calibration()
+            metrics.mark_startup("database ready")
+            self.db_ready.emit()
         except Exception as e:
             self.error.emit(str(e))
+        finally:
+            close_connection()
+        for name in self.PRELOAD_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                # Reported properly when the feature is actually used.
+                pass
+        metrics.mark_startup("modules preloaded")
+        self.finished.emit()
 
 class QuizConfigDialog(QDialog):
     """Popup to configure Quiz settings."""
@@ -53,8 +248,9 @@ class QuizConfigDialog(QDialog):
         layout = QVBoxLayout(self)
         form_layout = QFormLayout()
         
+        from quiz_engine import MAX_QUESTIONS
         self.num_q_spin = QSpinBox()
-        self.num_q_spin.setRange(1, 20)
+        self.num_q_spin.setRange(1, MAX_QUESTIONS)
         self.num_q_spin.setValue(5)
         
         self.difficulty_combo = QComboBox()
@@ -108,7 +304,7 @@ class HistoryDetailDialog(QDialog):
         input_layout = QVBoxLayout(input_widget)
         input_layout.setContentsMargins(0,0,0,0)
         input_layout.addWidget(QLabel("<b>Original Input:</b>"))
-        input_edit = QTextEdit()
+        input_edit = QPlainTextEdit()
         input_edit.setPlainText(input_text)
         input_edit.setReadOnly(True)
         input_layout.addWidget(input_edit)
@@ -118,7 +314,7 @@ class HistoryDetailDialog(QDialog):
         output_layout = QVBoxLayout(output_widget)
         output_layout.setContentsMargins(0,0,0,0)
         output_layout.addWidget(QLabel("<b>Generated Result:</b>"))
-        output_edit = QTextEdit()
+        output_edit = QPlainTextEdit()
         output_edit.setPlainText(output_text)
         output_edit.setReadOnly(True)
         output_layout.addWidget(output_edit)
@@ -131,37 +327,145 @@ class HistoryDetailDialog(QDialog):
         
         self.setStyleSheet("""
             QDialog, QWidget { background-color: rgb(35, 36, 45); color: white; }
-            QTextEdit { background-color: rgb(24, 25, 30); color: rgb(220, 220, 220); border: 1px solid rgb(55, 60, 75); padding: 10px; }
+            QPlainTextEdit { background-color: rgb(24, 25, 30); color: rgb(220, 220, 220); border: 1px solid rgb(55, 60, 75); padding: 10px; }
             QLabel { color: rgb(150, 150, 150); font-size: 14px; margin-bottom: 5px; }
             QPushButton { background-color: rgb(70, 70, 80); color: white; border: none; padding: 8px 15px; border-radius: 5px; }
             QPushButton:hover { background-color: rgb(90, 90, 100); }
         """)
 
+class HistoryTableModel(QAbstractTableModel):
+    """Preview rows of chat_history, fetched a page at a time as the view scrolls."""
+    HEADERS = ["ID", "Time", "Input Preview", "Result Preview", "Type"]
+    PAGE_SIZE = 100
+
+    search_failed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+        self.exhausted = False
+        self.search_text = ""
+        # Searches run on the thread pool; only the latest one's rows are shown.
+        self.search_generation = 0
+        self.search_jobs = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        rec_id, timestamp, inp, out, mode = self.rows[index.row()]
+        column = index.column()
+        if column == 0:
+            return str(rec_id)
+        if column == 1:
+            return timestamp[:16].replace('T', ' ')
+        if column == 2:
+            return inp
+        if column == 3:
+            return out
+        return mode
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        before_id = self.rows[-1][0] if self.rows else None
+        page = get_history_page(self.PAGE_SIZE, before_id)
+        if len(page) < self.PAGE_SIZE:
+            self.exhausted = True
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
+
+    def reload(self):
+        self.search_generation += 1
+        if self.search_text.strip():
+            # Search results are ranked, so they come back in one bounded batch.
+            job = HistorySearchJob(self.search_generation, self.search_text)
+            job.signals.found.connect(self.on_search_found)
+            job.signals.error.connect(self.on_search_error)
+            self.search_jobs[job.generation] = job
+            QThreadPool.globalInstance().start(job)
+            return
+        self.beginResetModel()
+        self.rows = []
+        self.exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def on_search_found(self, generation, rows):
+        self.search_jobs.pop(generation, None)
+        if generation != self.search_generation:
+            return
+        self.beginResetModel()
+        self.rows = rows
+        self.exhausted = True
+        self.endResetModel()
+
+    def on_search_error(self, generation, message):
+        self.search_jobs.pop(generation, None)
+        if generation == self.search_generation:
+            self.search_failed.emit(message)
+
+    def set_search_text(self, text):
+        self.search_text = text
+        self.reload()
+
+    def record_id(self, row):
+        return self.rows[row][0]
+
 class HistoryDialog(QDialog):
+    INFO_TEXT = "Double-click a row to view full details."
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("History")
         self.resize(900, 600)
-        self.full_records = [] 
+        self.model = HistoryTableModel(self)
+        self.model.search_failed.connect(self.on_search_failed)
         self.setup_ui()
         self.load_data()
 
     def setup_ui(self):
         layout = QVBoxLayout(self)
         
-        info_label = QLabel("Double-click a row to view full details.")
-        info_label.setStyleSheet("color: gray; font-style: italic;")
-        layout.addWidget(info_label)
+        self.info_label = QLabel(self.INFO_TEXT)
+        self.info_label.setStyleSheet("color: gray; font-style: italic;")
+        layout.addWidget(self.info_label)
 
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["ID", "Time", "Input Preview", "Result Preview", "Type"])
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search history...")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        layout.addWidget(self.search_input)
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.verticalHeader().setVisible(False)
         self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
         self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
         self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
         self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.Stretch)
         self.table.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeToContents)
         self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
         self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
         self.table.doubleClicked.connect(self.view_details)
         
@@ -182,7 +486,8 @@ class HistoryDialog(QDialog):
         
         self.setStyleSheet("""
             QDialog { background-color: rgb(35, 36, 45); color: white; }
-            QTableWidget { background-color: rgb(24, 25, 30); color: rgb(220, 220, 220); border: 1px solid rgb(55, 60, 75); gridline-color: rgb(55, 60, 75); }
+            QTableView { background-color: rgb(24, 25, 30); color: rgb(220, 220, 220); border: 1px solid rgb(55, 60, 75); gridline-color: rgb(55, 60, 75); }
+            QLineEdit { background-color: rgb(24, 25, 30); color: white; padding: 6px; border: 1px solid rgb(55, 60, 75); border-radius: 4px; }
             QHeaderView::section { background-color: rgb(45, 45, 50); color: white; padding: 5px; border: 1px solid rgb(55, 60, 75); }
             QPushButton { background-color: rgb(70, 70, 80); color: white; border: none; padding: 8px 15px; border-radius: 5px; font-weight: bold; }
             QPushButton:hover { background-color: rgb(90, 90, 100); }
@@ -194,28 +499,34 @@ class HistoryDialog(QDialog):
         """)
 
     def load_data(self):
-        self.full_records = get_history()
-        self.table.setRowCount(len(self.full_records))
-        for row, (rec_id, timestamp, inp, out, mode) in enumerate(self.full_records):
-            self.table.setItem(row, 0, QTableWidgetItem(str(rec_id)))
-            self.table.setItem(row, 1, QTableWidgetItem(timestamp[:16].replace('T', ' ')))
-            input_preview = (inp[:50] + '...') if len(inp) > 50 else inp
-            self.table.setItem(row, 2, QTableWidgetItem(input_preview))
-            output_preview = (out[:50] + '...') if len(out) > 50 else out
-            self.table.setItem(row, 3, QTableWidgetItem(output_preview))
-            self.table.setItem(row, 4, QTableWidgetItem(mode))
+        self.model.reload()
+
+    def run_search(self):
+        self.info_label.setText(self.INFO_TEXT)
+        self.model.set_search_text(self.search_input.text())
+
+    def on_search_failed(self, message):
+        self.info_label.setText(f"Search failed: {message}")
+
+    def current_record_id(self):
+        index = self.table.currentIndex()
+        if not index.isValid():
+            return None
+        return self.model.record_id(index.row())
 
     def view_details(self):
-        row = self.table.currentRow()
-        if row >= 0:
-            _, _, full_input, full_output, _ = self.full_records[row]
+        rec_id = self.current_record_id()
+        if rec_id is not None:
+            record = get_record(rec_id)
+            if record is None:
+                return
+            _, _, full_input, full_output, _ = record
             detail_dialog = HistoryDetailDialog(full_input, full_output, self)
             detail_dialog.exec_()
 
     def delete_selected(self):
-        row = self.table.currentRow()
-        if row >= 0:
-            rec_id = self.full_records[row][0]
+        rec_id = self.current_record_id()
+        if rec_id is not None:
             confirm = QMessageBox.question(
                 self, "Confirm Delete", 
                 "Are you sure you want to delete this record?",
@@ -225,6 +536,102 @@ class HistoryDialog(QDialog):
                 delete_record(rec_id)
                 self.load_data()
 
+class PerformanceDialog(QDialog):
+    """Latency percentiles per model/task (from saved run metrics) and per
+    pipeline stage (this session)."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Performance")
+        self.resize(1000, 650)
+        self.setup_ui()
+        self.load_data()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+
+        layout.addWidget(QLabel("<b>Runs by model and task</b> (latencies in ms, most recent 5000 runs)"))
+        self.runs_table = self.make_table([
+            "Model", "Task", "Runs", "Errors", "Cache Hit %", "Fallbacks",
+            "Avg Tokens In", "Avg Tokens Out", "TTFB p50", "p50", "p90", "p99"
+        ])
+        layout.addWidget(self.runs_table)
+
+        layout.addWidget(QLabel("<b>Pipeline stages</b> (this session, latencies in ms)"))
+        self.stages_table = self.make_table(["Stage", "Calls", "p50", "p90", "p99", "Max"])
+        layout.addWidget(self.stages_table)
+
+        self.counters_label = QLabel()
+        self.counters_label.setStyleSheet("color: gray;")
+        layout.addWidget(self.counters_label)
+
+        self.startup_label = QLabel()
+        self.startup_label.setStyleSheet("color: gray;")
+        layout.addWidget(self.startup_label)
+
+        btn_layout = QHBoxLayout()
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.clicked.connect(self.load_data)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.accept)
+        btn_layout.addWidget(refresh_btn)
+        btn_layout.addStretch(1)
+        btn_layout.addWidget(close_btn)
+        layout.addLayout(btn_layout)
+
+        self.setStyleSheet("""
+            QDialog { background-color: rgb(35, 36, 45); color: white; }
+            QLabel { color: rgb(200, 200, 200); font-size: 14px; }
+            QTableWidget { background-color: rgb(24, 25, 30); color: rgb(220, 220, 220); border: 1px solid rgb(55, 60, 75); gridline-color: rgb(55, 60, 75); }
+            QHeaderView::section { background-color: rgb(45, 45, 50); color: white; padding: 5px; border: 1px solid rgb(55, 60, 75); }
+            QPushButton { background-color: rgb(70, 70, 80); color: white; border: none; padding: 8px 15px; border-radius: 5px; font-weight: bold; }
+            QPushButton:hover { background-color: rgb(90, 90, 100); }
+        """)
+
+    def make_table(self, headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        table.horizontalHeader().setStretchLastSection(True)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        return table
+
+    def fill_table(self, table, rows):
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                table.setItem(row, column, QTableWidgetItem(value))
+
+    def load_data(self):
+        def ms(value):
+            return "-" if value is None else f"{value:.0f}"
+
+        self.fill_table(self.runs_table, [
+            [entry["model"], entry["task_type"], str(entry["runs"]), str(entry["errors"]),
+             f"{entry['cache_hit_rate'] * 100:.0f}", str(entry["fallbacks"]),
+             f"{entry['avg_tokens_in']:.0f}", f"{entry['avg_tokens_out']:.0f}",
+             ms(entry["ttfb_p50"]), ms(entry["total_p50"]), ms(entry["total_p90"]), ms(entry["total_p99"])]
+            for entry in get_run_metric_summary()
+        ])
+
+        stages = metrics.get_stage_snapshot()
+        self.fill_table(self.stages_table, [
+            [stage, str(count)] + [ms(value * 1000) for value in (p50, p90, p99, worst)]
+            for stage, (count, p50, p90, p99, worst) in sorted(stages.items())
+        ])
+
+        counters = metrics.get_counters()
+        self.counters_label.setText(
+            ", ".join(f"{name.replace('_', ' ')}: {value}" for name, value in sorted(counters.items()))
+            or "No runs recorded this session."
+        )
+
+        startup = metrics.get_startup_report()
+        self.startup_label.setText(
+            "Startup: " + ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in startup)
+            if startup else ""
+        )
+
 class DarkApp(QMainWindow):
 
     def __init__(self):
@@ -232,9 +639,61 @@ class DarkApp(QMainWindow):
         self.setWindowTitle("AI Processing Configurator")
         self.setup_dark_theme()
         self.create_widgets()
-        init_db() 
-        self.thread = None
-        self.worker = None
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(self.concurrency_spin.value())
+        self.jobs = {}
+        self.next_job_id = 1
+        self.focused_job_id = None
+        self.jobs_timer = QTimer(self)
+        self.jobs_timer.setInterval(500)
+        self.jobs_timer.timeout.connect(self.refresh_job_times)
+        self.loader_thread = None
+        self.loader = None
+        self.load_queue = []
+        self.loaded_any = False
+        self.separate_next_file = False
+        # Text of text_input as of the last toPlainText(); dropped on any edit.
+        self.input_text_cache = None
+        self.setAcceptDrops(True)
+        self.db_ready = False
+        self.start_background_init()
+
+    def start_background_init(self):
+        # History needs the database; everything else works while it is prepared.
+        self.history_button.setEnabled(False)
+        self.performance_button.setEnabled(False)
+        self.startup_thread = QThread()
+        self.startup_worker = StartupWorker()
+        self.startup_worker.moveToThread(self.startup_thread)
+        self.startup_thread.started.connect(self.startup_worker.run)
+        self.startup_worker.db_ready.connect(self.on_db_ready)
+        self.startup_worker.error.connect(self.on_db_error)
+        self.startup_worker.finished.connect(self.on_startup_finished)
+        self.startup_worker.finished.connect(self.startup_thread.quit)
+        self.startup_worker.finished.connect(self.startup_worker.deleteLater)
+        self.startup_thread.finished.connect(self.startup_thread.deleteLater)
+        self.startup_running = True
+        self.startup_thread.start()
+
+    def on_startup_finished(self):
+        self.startup_running = False
+
+    def closeEvent(self, event):
+        # A module import cannot be interrupted; let it finish before Qt tears down.
+        if self.startup_running:
+            self.startup_thread.wait()
+        super().closeEvent(event)
+
+    def on_db_ready(self):
+        self.db_ready = True
+        self.history_button.setEnabled(True)
+        self.performance_button.setEnabled(True)
+        job = self.jobs.get(self.focused_job_id)
+        if job is not None:
+            self.save_button.setEnabled(job.state == "Done" and not job.saved)
+
+    def on_db_error(self, error_msg):
+        self.summary_output.setPlainText(f"Error opening history database: {error_msg}")
 
     def setup_dark_theme(self):
         dark_palette = QPalette()
@@ -253,11 +712,13 @@ class DarkApp(QMainWindow):
         self.setStyleSheet("""
             QMainWindow, QWidget { background-color: rgb(24, 25, 30); }
             QLabel { color: rgb(220, 220, 220); font-size: 15px; font-family: 'Segoe UI', sans-serif; }
-            QTextEdit, QLineEdit { background-color: rgb(35, 36, 45); color: rgb(240, 240, 240); border: 2px solid rgb(55, 60, 75); padding: 12px; border-radius: 10px; font-size: 16px; font-family: 'Segoe UI', sans-serif; }
+            QPlainTextEdit, QLineEdit { background-color: rgb(35, 36, 45); color: rgb(240, 240, 240); border: 2px solid rgb(55, 60, 75); padding: 12px; border-radius: 10px; font-size: 16px; font-family: 'Segoe UI', sans-serif; }
             QGroupBox { border: 1px solid rgb(55, 60, 75); border-radius: 8px; margin-top: 10px; padding-top: 15px; font-family: 'Segoe UI', sans-serif; }
             QGroupBox::title { subcontrol-origin: margin; subcontrol-position: top left; padding: 0 5px; color: rgb(150, 150, 150); font-weight: bold; }
             QRadioButton { color: rgb(220, 220, 220); padding: 5px 0; font-family: 'Segoe UI', sans-serif; }
             QRadioButton::indicator { width: 16px; height: 16px; }
+            QCheckBox { color: rgb(220, 220, 220); padding: 5px 0; font-family: 'Segoe UI', sans-serif; }
+            QCheckBox::indicator { width: 16px; height: 16px; }
             QPushButton { background-color: rgb(135, 140, 250); color: white; border: none; padding: 10px 20px; border-radius: 8px; font-size: 16px; font-weight: bold; font-family: 'Segoe UI', sans-serif; }
             QPushButton:hover { background-color: rgb(150, 155, 255); }
             #processButton { background-color: rgb(30, 200, 150); }
@@ -266,6 +727,13 @@ class DarkApp(QMainWindow):
             #saveButton:hover { background-color: rgb(90, 170, 120); }
             #historyButton { background-color: rgb(100, 100, 120); }
             #historyButton:hover { background-color: rgb(120, 120, 140); }
+            #cancelButton { background-color: rgb(180, 60, 60); padding: 6px 14px; }
+            #cancelButton:hover { background-color: rgb(200, 80, 80); }
+            QTableWidget { background-color: rgb(35, 36, 45); color: rgb(220, 220, 220); border: 1px solid rgb(55, 60, 75); gridline-color: rgb(55, 60, 75); }
+            QHeaderView::section { background-color: rgb(45, 45, 50); color: white; padding: 5px; border: 1px solid rgb(55, 60, 75); }
+            QSpinBox { background-color: rgb(35, 36, 45); color: white; padding: 4px; border: 1px solid rgb(55, 60, 75); border-radius: 4px; }
+            QProgressBar { border: 1px solid rgb(55, 60, 75); border-radius: 6px; background-color: rgb(35, 36, 45); color: white; text-align: center; }
+            QProgressBar::chunk { background-color: rgb(135, 140, 250); border-radius: 6px; }
             
             QScrollBar:vertical { border: none; background: rgb(35, 36, 45); width: 14px; margin: 0px; }
             QScrollBar::handle:vertical { background: rgb(80, 80, 90); min-height: 20px; border-radius: 7px; margin: 2px; }
@@ -316,8 +784,10 @@ class DarkApp(QMainWindow):
         self.task_summary_radio = QRadioButton("Summarize")
         self.task_summary_radio.setChecked(True)
         self.task_mcq_radio = QRadioButton("Generate Quiz")
+        self.task_both_radio = QRadioButton("Both")
         task_layout.addWidget(self.task_summary_radio)
         task_layout.addWidget(self.task_mcq_radio)
+        task_layout.addWidget(self.task_both_radio)
         
         top_bar_layout.addWidget(mode_group)
         top_bar_layout.addWidget(task_group)
@@ -328,6 +798,12 @@ class DarkApp(QMainWindow):
         self.history_button.setFixedWidth(150)
         self.history_button.clicked.connect(self.open_history)
         top_bar_layout.addWidget(self.history_button)
+
+        self.performance_button = QPushButton("Performance")
+        self.performance_button.setObjectName("historyButton")
+        self.performance_button.setFixedWidth(150)
+        self.performance_button.clicked.connect(self.open_performance)
+        top_bar_layout.addWidget(self.performance_button)
         
         main_layout.addLayout(top_bar_layout)
         
@@ -336,27 +812,111 @@ class DarkApp(QMainWindow):
         self.upload_button = QPushButton("Upload Document")
         self.upload_button.setCursor(Qt.PointingHandCursor)
         self.upload_button.clicked.connect(self.handle_file_upload)
+        self.load_progress = QProgressBar()
+        self.load_progress.setFixedWidth(250)
+        self.load_progress.setVisible(False)
+        self.cancel_load_button = QPushButton("Cancel")
+        self.cancel_load_button.setObjectName("cancelButton")
+        self.cancel_load_button.setCursor(Qt.PointingHandCursor)
+        self.cancel_load_button.clicked.connect(self.cancel_file_loading)
+        self.cancel_load_button.setVisible(False)
+        self.preprocess_checkbox = QCheckBox("Clean up text")
+        self.preprocess_checkbox.setChecked(True)
+        self.preprocess_checkbox.setToolTip(
+            "Remove running headers, page numbers, hyphenated line breaks and duplicate paragraphs "
+            "from uploaded documents."
+        )
         input_header_layout.addWidget(input_label)
         input_header_layout.addStretch(1)
+        input_header_layout.addWidget(self.preprocess_checkbox)
+        input_header_layout.addWidget(self.load_progress)
+        input_header_layout.addWidget(self.cancel_load_button)
         input_header_layout.addWidget(self.upload_button)
         main_layout.addLayout(input_header_layout)
         
-        self.text_input = QTextEdit()
-        self.text_input.setPlaceholderText("Paste text or upload a document...")
+        # Plain-text editors: no rich-text parsing, and layout stays fast for
+        # multi-megabyte documents.
+        self.text_input = QPlainTextEdit()
+        # File drops go to the window's load queue rather than pasting the path.
+        self.text_input.setAcceptDrops(False)
+        self.text_input.setPlaceholderText("Paste text, upload or drop documents...")
         self.text_input.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.text_input.setMinimumHeight(200)
+        self.text_input.textChanged.connect(self.on_input_changed)
         main_layout.addWidget(self.text_input)
+
+        stats_layout = QHBoxLayout()
+        stats_layout.addStretch(1)
+        self.input_stats_label = QLabel("0 characters")
+        self.input_stats_label.setAlignment(Qt.AlignRight)
+        stats_layout.addWidget(self.input_stats_label)
+        self.count_tokens_button = QPushButton("Count Tokens")
+        self.count_tokens_button.setCursor(Qt.PointingHandCursor)
+        self.count_tokens_button.setToolTip("Ask the API for the exact token count (one extra request).")
+        self.count_tokens_button.clicked.connect(self.count_input_tokens)
+        stats_layout.addWidget(self.count_tokens_button)
+        main_layout.addLayout(stats_layout)
+        self.input_stats_timer = QTimer(self)
+        self.input_stats_timer.setSingleShot(True)
+        self.input_stats_timer.setInterval(150)
+        self.input_stats_timer.timeout.connect(self.update_input_stats)
+        # The estimated route depends on the mode and action as well as the text.
+        for radio in (self.accuracy_radio, self.task_mcq_radio):
+            radio.toggled.connect(lambda _: self.input_stats_timer.start())
+        self.token_count_job = None
         
         self.process_button = QPushButton("Run AI Processor")
         self.process_button.setCursor(Qt.PointingHandCursor)
         self.process_button.setObjectName("processButton") 
         self.process_button.clicked.connect(self.handle_processing)
         main_layout.addWidget(self.process_button)
+
+        jobs_group = QGroupBox("Jobs")
+        jobs_group.setFont(QFont("Segoe UI", 11))
+        jobs_layout = QVBoxLayout(jobs_group)
+        concurrency_layout = QHBoxLayout()
+        concurrency_layout.addWidget(QLabel("Parallel jobs:"))
+        self.concurrency_spin = QSpinBox()
+        self.concurrency_spin.setRange(1, 8)
+        self.concurrency_spin.setValue(2)
+        self.concurrency_spin.valueChanged.connect(self.set_concurrency)
+        concurrency_layout.addWidget(self.concurrency_spin)
+        concurrency_layout.addSpacing(20)
+        concurrency_layout.addWidget(QLabel("Hedge after:"))
+        self.hedge_spin = QSpinBox()
+        self.hedge_spin.setRange(0, 120)
+        self.hedge_spin.setSuffix(" s")
+        self.hedge_spin.setSpecialValueText("Off")
+        self.hedge_spin.setToolTip(
+            "Also send a request to the fallback model once the primary has taken this long, "
+            "and keep whichever answers first. Applies to quizzes and the sections of long "
+            "documents; streamed summaries are not hedged."
+        )
+        self.hedge_spin.valueChanged.connect(self.set_hedge_after)
+        concurrency_layout.addWidget(self.hedge_spin)
+        concurrency_layout.addStretch(1)
+        jobs_layout.addLayout(concurrency_layout)
+        self.jobs_table = QTableWidget(0, 5)
+        self.jobs_table.setHorizontalHeaderLabels(["#", "Job", "State", "Elapsed", ""])
+        self.jobs_table.verticalHeader().setVisible(False)
+        self.jobs_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeToContents)
+        self.jobs_table.horizontalHeader().setSectionResizeMode(1, QHeaderView.Stretch)
+        self.jobs_table.horizontalHeader().setSectionResizeMode(2, QHeaderView.ResizeToContents)
+        self.jobs_table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
+        self.jobs_table.horizontalHeader().setSectionResizeMode(4, QHeaderView.ResizeToContents)
+        self.jobs_table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.jobs_table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.jobs_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.jobs_table.setMinimumHeight(150)
+        self.jobs_table.cellClicked.connect(self.on_job_clicked)
+        jobs_layout.addWidget(self.jobs_table)
+        main_layout.addWidget(jobs_group)
         
         output_label = QLabel("Generated Output:")
         main_layout.addWidget(output_label)
-        self.summary_output = QTextEdit()
+        self.summary_output = QPlainTextEdit()
         self.summary_output.setReadOnly(True)
+        self.summary_output.setUndoRedoEnabled(False)
         self.summary_output.setPlaceholderText("Output will appear here...")
         self.summary_output.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.MinimumExpanding)
         self.summary_output.setMinimumHeight(250)
@@ -378,86 +938,354 @@ class DarkApp(QMainWindow):
 
     def handle_file_upload(self):
         options = QFileDialog.Options()
-        file_path, _ = QFileDialog.getOpenFileName(
-            self, "Open Document", "", "Documents (*.txt *.pdf *.docx);;All Files (*)", options=options
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self, "Open Documents", "", "Documents (*.txt *.pdf *.docx);;All Files (*)", options=options
         )
-        if file_path:
-            text_content = ""
-            try:
-                if file_path.lower().endswith('.pdf'):
-                    text_content = extract_text_from_pdf(file_path)
-                elif file_path.lower().endswith('.docx'):
-                    text_content = extract_text_from_docx(file_path)
-                elif file_path.lower().endswith('.txt'):
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        text_content = f.read()
-                self.text_input.setText(text_content)
-                self.summary_output.setText(f"Loaded: {os.path.basename(file_path)}")
-                self.save_button.setEnabled(False)
-            except Exception as e:
-                self.summary_output.setText(f"Error loading file: {str(e)}")
+        self.queue_files(file_paths)
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event):
+        paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+        self.queue_files([p for p in paths if p.lower().endswith(SUPPORTED_EXTENSIONS)])
+        event.acceptProposedAction()
+
+    def queue_files(self, file_paths):
+        if not file_paths:
+            return
+        if self.loader is None:
+            self.text_input.clear()
+            # Loaded text is not something to undo piece by piece, and the undo
+            # stack would keep a second copy of it.
+            self.text_input.setUndoRedoEnabled(False)
+            self.loaded_any = False
+        self.load_queue.extend(file_paths)
+        if self.loader is None:
+            self.start_next_load()
+
+    def start_next_load(self):
+        if not self.load_queue:
+            self.loader = None
+            self.loader_thread = None
+            self.text_input.setUndoRedoEnabled(True)
+            self.load_progress.setVisible(False)
+            self.cancel_load_button.setVisible(False)
+            return
+
+        file_path = self.load_queue.pop(0)
+        self.separate_next_file = self.loaded_any
+        self.summary_output.setPlainText(f"Loading: {os.path.basename(file_path)}...")
+        self.save_button.setEnabled(False)
+        self.load_progress.setRange(0, 0)
+        self.load_progress.setVisible(True)
+        self.cancel_load_button.setVisible(True)
+
+        self.loader_thread = QThread()
+        self.loader = DocumentLoaderWorker(file_path, self.preprocess_checkbox.isChecked())
+        self.loader.moveToThread(self.loader_thread)
+        self.loader_thread.started.connect(self.loader.run)
+        self.loader.text_chunk.connect(self.on_load_chunk)
+        self.loader.progress.connect(self.on_load_progress)
+        self.loader.finished.connect(self.on_load_finished)
+        self.loader.error.connect(self.on_load_error)
+        self.loader.cancelled.connect(self.on_load_cancelled)
+        for signal in (self.loader.finished, self.loader.error, self.loader.cancelled):
+            signal.connect(self.loader_thread.quit)
+            signal.connect(self.loader.deleteLater)
+        # The next file starts only once this thread has fully stopped.
+        self.loader_thread.finished.connect(self.start_next_load)
+        self.loader_thread.finished.connect(self.loader_thread.deleteLater)
+        self.loader_thread.start()
+
+    def on_load_chunk(self, text):
+        if self.separate_next_file:
+            text = "\n\n" + text
+            self.separate_next_file = False
+        self.append_input_text(text)
+
+    def append_input_text(self, text):
+        cursor = self.text_input.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        self.loaded_any = True
+
+    def on_input_changed(self):
+        self.input_text_cache = None
+        self.input_stats_timer.start()
+
+    def input_char_count(self):
+        # characterCount() is kept up to date by the document itself, so this
+        # never copies the text; the final paragraph separator is not counted.
+        return self.text_input.document().characterCount() - 1
+
+    def update_input_stats(self, exact_tokens=None):
+        chars = self.input_char_count()
+        if not chars:
+            self.input_stats_label.setText("0 characters")
+            return
+        route = token_budget.plan_route(
+            chars, self.selected_mode(), "mcq" if self.task_mcq_radio.isChecked() else "summary",
+            tokens=exact_tokens
+        )
+        tokens = f"{route.tokens:,} tokens (counted)" if exact_tokens is not None else f"~{route.tokens:,} tokens"
+        self.input_stats_label.setText(f"{chars:,} characters · {tokens} · {route.describe()}")
+
+    def selected_mode(self):
+        return "speed" if self.speed_radio.isChecked() else "accuracy"
+
+    def count_input_tokens(self):
+        input_text = self.current_input_text()
+        if not input_text or input_text.isspace() or self.token_count_job is not None:
+            return
+        api_key = self.api_input.text().strip() or os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            self.input_stats_label.setText("Enter an API key to count tokens exactly.")
+            return
+        self.token_count_job = TokenCountJob(input_text, self.selected_mode(), api_key)
+        self.token_count_job.signals.counted.connect(self.on_tokens_counted)
+        self.token_count_job.signals.error.connect(self.on_token_count_error)
+        self.count_tokens_button.setEnabled(False)
+        QThreadPool.globalInstance().start(self.token_count_job)
+
+    def on_tokens_counted(self, tokens):
+        counted_text = self.token_count_job.text
+        self.token_count_job = None
+        self.count_tokens_button.setEnabled(True)
+        # Any edit while the request was out drops the cached text.
+        if self.input_text_cache is counted_text:
+            self.update_input_stats(exact_tokens=tokens)
+
+    def on_token_count_error(self, error_msg):
+        self.token_count_job = None
+        self.count_tokens_button.setEnabled(True)
+        self.input_stats_label.setText(f"Token count failed: {error_msg}")
+
+    def current_input_text(self):
+        if self.input_text_cache is None:
+            self.input_text_cache = self.text_input.toPlainText()
+        return self.input_text_cache
+
+    def on_load_progress(self, done, total):
+        self.load_progress.setRange(0, max(total, 1))
+        self.load_progress.setValue(done)
+
+    def on_load_finished(self, file_path, savings):
+        message = f"Loaded: {os.path.basename(file_path)}"
+        self.summary_output.setPlainText(f"{message}\n{savings}" if savings else message)
+
+    def on_load_error(self, error_msg):
+        self.summary_output.setPlainText(f"Error loading file: {error_msg}")
+
+    def on_load_cancelled(self):
+        self.summary_output.setPlainText("Loading cancelled.")
+
+    def cancel_file_loading(self):
+        self.load_queue.clear()
+        if self.loader is not None:
+            self.loader.cancel()
 
     def handle_processing(self):
-        input_text = self.text_input.toPlainText()
+        input_text = self.current_input_text()
         api_key = self.api_input.text().strip()
 
-        if not input_text.strip():
-            self.summary_output.setText("Please provide input text.")
+        if not input_text or input_text.isspace():
+            self.summary_output.setPlainText("Please provide input text.")
             return
         
         if not api_key and not os.environ.get("GEMINI_API_KEY"):
-            self.summary_output.setText("Error: Please enter your Google API Key above or set GEMINI_API_KEY environment variable.")
+            self.summary_output.setPlainText("Error: Please enter your Google API Key above or set GEMINI_API_KEY environment variable.")
             return
 
-        mode = "speed" if self.speed_radio.isChecked() else "accuracy"
-        task_type = "mcq" if self.task_mcq_radio.isChecked() else "summary"
+        mode = self.selected_mode()
+        if self.task_both_radio.isChecked():
+            task_types = ["summary", "mcq"]
+        elif self.task_mcq_radio.isChecked():
+            task_types = ["mcq"]
+        else:
+            task_types = ["summary"]
         
         num_questions = 5
         difficulty = "Medium"
         
-        if task_type == "mcq":
+        if "mcq" in task_types:
             config_dialog = QuizConfigDialog(self)
             if config_dialog.exec_() == QDialog.Accepted:
                 num_questions, difficulty = config_dialog.get_values()
             else:
                 return 
 
-        self.summary_output.setText("Connecting to Cloud API... Please wait...")
-        self.process_button.setEnabled(False)
-        self.process_button.setText("Processing...")
-        
-        self.thread = QThread()
-
-        self.worker = AIWorker(input_text, mode, task_type, api_key, num_questions, difficulty)
-        self.worker.moveToThread(self.thread)
-        self.thread.started.connect(self.worker.run)
-        self.worker.finished.connect(self.on_processing_finished)
-        self.worker.error.connect(self.on_processing_error)
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-        self.thread.start()
-
-    def on_processing_finished(self, result):
-        self.summary_output.setText(result)
-        self.save_button.setEnabled(True)
-        self.process_button.setEnabled(True)
-        self.process_button.setText("Run AI Processor")
-
-    def on_processing_error(self, error_msg):
-        self.summary_output.setText(f"Error: {error_msg}")
-        self.process_button.setEnabled(True)
-        self.process_button.setText("Run AI Processor")
+        for task_type in task_types:
+            self.submit_job(input_text, mode, task_type, api_key, num_questions, difficulty)
+
+    def submit_job(self, input_text, mode, task_type, api_key, num_questions, difficulty):
+        job_id = self.next_job_id
+        self.next_job_id += 1
+        task = "Quiz" if task_type == "mcq" else "Summary"
+        preview = " ".join(input_text[:40].split())
+        label = f"{task} ({mode}) - {preview}..."
+
+        runnable = AIJob(job_id, input_text, mode, task_type, api_key, num_questions, difficulty)
+        runnable.signals.started.connect(self.on_job_started)
+        runnable.signals.chunk.connect(self.on_processing_chunk)
+        runnable.signals.finished.connect(self.on_processing_finished)
+        runnable.signals.error.connect(self.on_processing_error)
+        job = JobInfo(job_id, label, input_text, f"{mode} | {task}", runnable)
+        self.jobs[job_id] = job
+
+        row = self.jobs_table.rowCount()
+        self.jobs_table.insertRow(row)
+        self.jobs_table.setItem(row, 0, QTableWidgetItem(str(job_id)))
+        self.jobs_table.setItem(row, 1, QTableWidgetItem(label))
+        self.jobs_table.setItem(row, 2, QTableWidgetItem(job.state))
+        self.jobs_table.setItem(row, 3, QTableWidgetItem(""))
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.setObjectName("cancelButton")
+        cancel_btn.clicked.connect(lambda _, jid=job_id: self.cancel_job(jid))
+        self.jobs_table.setCellWidget(row, 4, cancel_btn)
+
+        # The newest job takes over the output pane.
+        self.focus_job(job_id)
+        self.pool.start(runnable)
+        self.jobs_timer.start()
+
+    def set_concurrency(self, value):
+        self.pool.setMaxThreadCount(value)
+
+    def set_hedge_after(self, value):
+        import summarizer_logic
+        summarizer_logic.HEDGE_AFTER_SECONDS = value or None
+
+    def job_row(self, job_id):
+        for row in range(self.jobs_table.rowCount()):
+            if self.jobs_table.item(row, 0).text() == str(job_id):
+                return row
+        return -1
+
+    def update_job_row(self, job):
+        row = self.job_row(job.job_id)
+        if row < 0:
+            return
+        self.jobs_table.item(row, 2).setText(job.state)
+        self.jobs_table.item(row, 3).setText(f"{job.elapsed():.1f}s" if job.started_at else "")
+        cancel_btn = self.jobs_table.cellWidget(row, 4)
+        if cancel_btn is not None:
+            cancel_btn.setEnabled(job.is_active())
+
+    def refresh_job_times(self):
+        active = False
+        for job in self.jobs.values():
+            if job.state == "Running":
+                self.update_job_row(job)
+            active = active or job.is_active()
+        if not active:
+            self.jobs_timer.stop()
+
+    def focus_job(self, job_id):
+        self.focused_job_id = job_id
+        job = self.jobs[job_id]
+        row = self.job_row(job_id)
+        if row >= 0:
+            self.jobs_table.selectRow(row)
+        if job.result is not None:
+            self.summary_output.setPlainText(job.result)
+        elif job.streamed_text:
+            self.summary_output.setPlainText(job.streamed_text)
+        elif job.state == "Cancelled":
+            self.summary_output.setPlainText("Job cancelled.")
+        else:
+            self.summary_output.setPlainText("Connecting to Cloud API... Please wait...")
+        self.save_button.setEnabled(self.db_ready and job.state == "Done" and not job.saved)
+
+    def on_job_clicked(self, row, column):
+        self.focus_job(int(self.jobs_table.item(row, 0).text()))
+
+    def cancel_job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or not job.is_active():
+            return
+        # Queued jobs are pulled from the pool; a running request cannot be
+        # interrupted, so its result is discarded when it arrives.
+        if job.state == "Queued" and self.pool.tryTake(job.runnable):
+            job.runnable = None
+        job.state = "Cancelled"
+        if job.started_at is not None:
+            job.finished_at = time.monotonic()
+        self.update_job_row(job)
+        if job_id == self.focused_job_id:
+            self.focus_job(job_id)
+
+    def on_job_started(self, job_id):
+        job = self.jobs[job_id]
+        if job.state == "Cancelled":
+            return
+        job.state = "Running"
+        job.started_at = time.monotonic()
+        self.update_job_row(job)
+
+    def on_processing_chunk(self, job_id, piece):
+        job = self.jobs[job_id]
+        if job.state == "Cancelled":
+            return
+        first = not job.streamed_text
+        job.streamed_text += piece
+        if job_id != self.focused_job_id:
+            return
+        if first:
+            self.summary_output.clear()
+        cursor = self.summary_output.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(piece)
+
+    def on_processing_finished(self, job_id, result):
+        job = self.jobs[job_id]
+        if job.runnable is not None:
+            job.questions = job.runnable.questions
+        job.runnable = None
+        if job.state == "Cancelled":
+            return
+        job.state = "Done"
+        job.finished_at = time.monotonic()
+        job.result = result
+        self.update_job_row(job)
+        if job_id != self.focused_job_id:
+            return
+        # Streamed output is kept as-is; only a fallback note or a result that
+        # did not match the stream (cache hit, retry) needs touching up.
+        if job.streamed_text and result.startswith(job.streamed_text):
+            remainder = result[len(job.streamed_text):]
+            if remainder:
+                cursor = self.summary_output.textCursor()
+                cursor.movePosition(QTextCursor.End)
+                cursor.insertText(remainder)
+        else:
+            self.summary_output.setPlainText(result)
+        self.save_button.setEnabled(self.db_ready)
+
+    def on_processing_error(self, job_id, error_msg):
+        job = self.jobs[job_id]
+        job.runnable = None
+        if job.state == "Cancelled":
+            return
+        job.state = "Failed"
+        job.finished_at = time.monotonic()
+        job.result = f"Error: {error_msg}"
+        self.update_job_row(job)
+        if job_id == self.focused_job_id:
+            self.summary_output.setPlainText(job.result)
 
     def save_current_chat(self):
-        input_text = self.text_input.toPlainText()
-        output_text = self.summary_output.toPlainText()
-        mode = "speed" if self.speed_radio.isChecked() else "accuracy"
-        task = "Quiz" if self.task_mcq_radio.isChecked() else "Summary"
-        save_mode = f"{mode} | {task}"
-        
-        if input_text and output_text:
-            save_summary_record(input_text, output_text, save_mode)
+        job = self.jobs.get(self.focused_job_id)
+        if job is None or job.state != "Done":
+            return
+        
+        if job.input_text and job.result:
+            if job.questions:
+                save_quiz_record(job.input_text, job.result, job.questions, job.save_mode)
+            else:
+                save_summary_record(job.input_text, job.result, job.save_mode)
+            job.saved = True
             QMessageBox.information(self, "Saved", "Chat has been saved to history.")
             self.save_button.setEnabled(False)
 
@@ -465,10 +1293,17 @@ class DarkApp(QMainWindow):
         dialog = HistoryDialog(self)
         dialog.exec_()
 
+    def open_performance(self):
+        dialog = PerformanceDialog(self)
+        dialog.exec_()
+
 def run_ui_setup():
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
     QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps)
     app = QApplication(sys.argv)
     window = DarkApp()
     window.showMaximized()
+    metrics.mark_startup("window shown")
+    # Runs once the event loop has processed the first paint.
+    QTimer.singleShot(0, lambda: metrics.mark_startup("window interactive"))
     sys.exit(app.exec_())
\ No newline at end of file
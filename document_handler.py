@@ -1,21 +1,196 @@
-import pypdf
-import docx
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
-def extract_text_from_pdf(file_path):
+import extraction_cache
+from metrics import timed
+
+# Page ranges handed to each extraction process. Small enough to keep every
+# worker busy and memory bounded, large enough to amortize re-opening the PDF.
+PAGES_PER_TASK = 16
+MAX_EXTRACT_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+TEXT_READ_CHARS = 1024 * 1024
+# PDF pages are joined with a form feed, so later stages (text_preprocessor)
+# can still tell where one page ends and the next begins.
+PAGE_BREAK = "\f"
+# Cached PDF text from before pages were kept apart was joined with newlines;
+# the suffix keeps it from being read back as page-separated text.
+PDF_CACHE_SUFFIX = "-pages"
+# DOCX paragraphs are joined with a blank line, the paragraph break
+# text_preprocessor cleans by; the suffix keeps text cached when they were
+# joined with a single newline from being read back.
+PARAGRAPH_BREAK = "\n\n"
+DOCX_CACHE_SUFFIX = "-paragraphs"
+
+# pypdf and docx are imported on first use: together they take longer to
+# import than the rest of the app, and most sessions need at most one of them.
+
+# Per-process reader, so each pool worker parses the PDF structure only once.
+_worker_reader = None
+
+# One pool for the whole process, so concurrent extractions (batch mode, the
+# loader thread) share MAX_EXTRACT_WORKERS processes rather than each starting
+# their own. Workers are spawned, not forked: the app runs other threads
+# (Qt, batch workers) whose held locks a fork would copy.
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        # A pool whose worker died stays broken; start a fresh one.
+        if _pool is None or _pool._broken:
+            _pool = ProcessPoolExecutor(
+                max_workers=MAX_EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+def _extract_page_range(file_path, start, stop):
+    """Runs in a worker process: extracts pages [start, stop) of one PDF."""
+    global _worker_reader
+    import pypdf
+    if _worker_reader is None or _worker_reader[0] != file_path:
+        _worker_reader = (file_path, pypdf.PdfReader(file_path))
+    reader = _worker_reader[1]
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+@timed('extract.pdf')
+def iter_pdf_pages(file_path, workers=None, progress=None):
+    """Yields the text of each non-empty page, in order.
+
+    Page ranges are extracted in parallel on a process pool; only a bounded
+    window of ranges is in flight at once. progress(done_pages, total_pages)
+    is called as ranges complete.
+    """
+    import pypdf
     try:
         reader = pypdf.PdfReader(file_path)
-        text = []
-        for page in reader.pages:
-            content = page.extract_text()
-            if content:
-                text.append(content)
-        return "\n".join(text)
+        total = len(reader.pages)
     except Exception as e:
         raise Exception(f"PDF parsing failed: {e}")
 
-def extract_text_from_docx(file_path):
+    workers = workers or MAX_EXTRACT_WORKERS
+
+    if workers == 1 or total <= PAGES_PER_TASK:
+        for i, page in enumerate(reader.pages, 1):
+            try:
+                content = page.extract_text()
+            except Exception as e:
+                raise Exception(f"PDF parsing failed: {e}")
+            if progress and (i % PAGES_PER_TASK == 0 or i == total):
+                progress(i, total)
+            if content:
+                yield content
+        return
+
+    del reader
+    workers = min(workers, MAX_EXTRACT_WORKERS)
+    ranges = [(start, min(start + PAGES_PER_TASK, total)) for start in range(0, total, PAGES_PER_TASK)]
+    executor = _get_pool()
+    pending = []
+    try:
+        next_range = 0
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < workers * 2:
+                start, stop = ranges[next_range]
+                pending.append((stop, executor.submit(_extract_page_range, file_path, start, stop)))
+                next_range += 1
+            stop, future = pending.pop(0)
+            try:
+                pages = future.result()
+            except Exception as e:
+                raise Exception(f"PDF parsing failed: {e}")
+            if progress:
+                progress(stop, total)
+            for content in pages:
+                if content:
+                    yield content
+    finally:
+        # Also reached when the consumer stops early: drop this file's queued ranges.
+        for _, future in pending:
+            future.cancel()
+
+@timed('extract.docx')
+def iter_docx_paragraphs(file_path, progress=None):
+    import docx
     try:
         doc = docx.Document(file_path)
-        return "\n".join([para.text for para in doc.paragraphs])
     except Exception as e:
-        raise Exception(f"DOCX parsing failed: {e}")
\ No newline at end of file
+        raise Exception(f"DOCX parsing failed: {e}")
+    paragraphs = doc.paragraphs
+    total = len(paragraphs)
+    for i, para in enumerate(paragraphs, 1):
+        yield para.text
+        if progress and (i % 200 == 0 or i == total):
+            progress(i, total)
+
+@timed('extract.txt')
+def iter_text_file(file_path, progress=None):
+    total = os.path.getsize(file_path)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        while True:
+            block = f.read(TEXT_READ_CHARS)
+            if not block:
+                break
+            yield block
+            if progress:
+                progress(min(f.buffer.tell(), total), total)
+
+@timed('extract.open')
+def iter_document(file_path, progress=None, use_cache=True):
+    """Yields the text of a .pdf, .docx or .txt file piece by piece, along
+    with the separator to join the pieces with.
+
+    Previously extracted files are served from the extraction cache without
+    parsing them again. PDF pieces are always whole pages.
+    """
+    lower = file_path.lower()
+    if lower.endswith('.pdf'):
+        separator, open_pieces = PAGE_BREAK, iter_pdf_pages
+    elif lower.endswith('.docx'):
+        separator, open_pieces = PARAGRAPH_BREAK, iter_docx_paragraphs
+    elif lower.endswith('.txt'):
+        separator, open_pieces = "", iter_text_file
+    else:
+        raise Exception(f"Unsupported file type: {os.path.basename(file_path)}")
+
+    if not use_cache:
+        return separator, open_pieces(file_path, progress=progress)
+
+    content_hash = extraction_cache.file_hash(file_path)
+    if open_pieces is iter_pdf_pages:
+        content_hash += PDF_CACHE_SUFFIX
+    elif open_pieces is iter_docx_paragraphs:
+        content_hash += DOCX_CACHE_SUFFIX
+    cached = extraction_cache.lookup(content_hash)
+    if cached is not None:
+        if progress:
+            progress(1, 1)
+        if separator == PAGE_BREAK:
+            return separator, split_stream(cached, separator)
+        return "", cached
+    return separator, extraction_cache.caching(content_hash, open_pieces(file_path, progress=progress), separator)
+
+def split_stream(blocks, separator):
+    """Re-splits a stream of text blocks into the pieces separated by separator."""
+    tail = ""
+    try:
+        for block in blocks:
+            pieces = (tail + block).split(separator)
+            tail = pieces.pop()
+            yield from pieces
+        yield tail
+    finally:
+        blocks.close()
+
+@timed('extract.text')
+def extract_text(file_path, use_cache=True):
+    separator, pieces = iter_document(file_path, use_cache=use_cache)
+    return separator.join(pieces)
+
+def extract_text_from_pdf(file_path):
+    return PAGE_BREAK.join(iter_pdf_pages(file_path))
+
+def extract_text_from_docx(file_path):
+    return PARAGRAPH_BREAK.join(iter_docx_paragraphs(file_path))
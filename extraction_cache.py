@@ -0,0 +1,153 @@
+import codecs
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from database_manager import DB_NAME
+
+# Extracted text is stored zlib-compressed, one file per source content hash.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(DB_NAME)), "extraction_cache")
+MAX_BYTES = 512 * 1024 * 1024
+READ_BYTES = 1024 * 1024
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _get_connection():
+    global _conn
+    if _conn is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        _conn = sqlite3.connect(os.path.join(CACHE_DIR, "index.db"), check_same_thread=False)
+        # files: the mtime/size pre-check that lets us skip re-hashing a file.
+        _conn.execute('''
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                mtime REAL,
+                size INTEGER,
+                content_hash TEXT
+            )
+        ''')
+        _conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                content_hash TEXT PRIMARY KEY,
+                size INTEGER,
+                last_access REAL
+            )
+        ''')
+        _conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_access ON entries (last_access)')
+        _conn.commit()
+    return _conn
+
+
+def _entry_path(content_hash):
+    return os.path.join(CACHE_DIR, content_hash + ".z")
+
+
+def file_hash(file_path):
+    """Returns the SHA-256 of the file, reusing the stored one when mtime and size are unchanged."""
+    path = os.path.abspath(file_path)
+    stat = os.stat(path)
+    with _lock:
+        row = _get_connection().execute(
+            'SELECT mtime, size, content_hash FROM files WHERE path = ?', (path,)
+        ).fetchone()
+    if row is not None and row[0] == stat.st_mtime and row[1] == stat.st_size:
+        return row[2]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BYTES), b''):
+            digest.update(block)
+    content_hash = digest.hexdigest()
+
+    with _lock:
+        conn = _get_connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO files (path, mtime, size, content_hash) VALUES (?, ?, ?, ?)',
+            (path, stat.st_mtime, stat.st_size, content_hash)
+        )
+        conn.commit()
+    return content_hash
+
+
+def lookup(content_hash):
+    """Returns a generator over the cached text for content_hash, or None on a miss."""
+    with _lock:
+        conn = _get_connection()
+        row = conn.execute('SELECT 1 FROM entries WHERE content_hash = ?', (content_hash,)).fetchone()
+        if row is None or not os.path.exists(_entry_path(content_hash)):
+            return None
+        conn.execute('UPDATE entries SET last_access = ? WHERE content_hash = ?', (time.time(), content_hash))
+        conn.commit()
+    return _read_entry(_entry_path(content_hash))
+
+
+def _read_entry(entry_path):
+    decompressor = zlib.decompressobj()
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with open(entry_path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BYTES), b''):
+            text = decoder.decode(decompressor.decompress(block))
+            if text:
+                yield text
+    tail = decoder.decode(decompressor.flush(), final=True)
+    if tail:
+        yield tail
+
+
+def caching(content_hash, pieces, separator):
+    """Passes pieces through unchanged while compressing them to the cache.
+    The entry is only committed if the generator is consumed to the end."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = _entry_path(content_hash) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+    compressor = zlib.compressobj(6)
+    completed = False
+    try:
+        with open(tmp_path, 'wb') as out:
+            first = True
+            for piece in pieces:
+                data = piece if first else separator + piece
+                out.write(compressor.compress(data.encode('utf-8')))
+                first = False
+                yield piece
+            out.write(compressor.flush())
+        completed = True
+    finally:
+        if hasattr(pieces, 'close'):
+            pieces.close()
+        if completed:
+            os.replace(tmp_path, _entry_path(content_hash))
+            _register(content_hash, os.path.getsize(_entry_path(content_hash)))
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _register(content_hash, size):
+    with _lock:
+        conn = _get_connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO entries (content_hash, size, last_access) VALUES (?, ?, ?)',
+            (content_hash, size, time.time())
+        )
+        _evict(conn)
+        conn.commit()
+
+
+def _evict(conn):
+    """Removes least recently used entries until the cache fits in MAX_BYTES."""
+    total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+    if total <= MAX_BYTES:
+        return
+    for content_hash, size in conn.execute('SELECT content_hash, size FROM entries ORDER BY last_access ASC').fetchall():
+        if total <= MAX_BYTES:
+            break
+        try:
+            os.remove(_entry_path(content_hash))
+        except FileNotFoundError:
+            pass
+        conn.execute('DELETE FROM entries WHERE content_hash = ?', (content_hash,))
+        total -= size
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+
+import gemini_client
+
+
+class FakeAPIError(Exception):
+    """Stand-in for a server error; code mirrors the HTTP status."""
+
+    def __init__(self, code=503, message="Simulated server error"):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FakeUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class FakeTokenCount:
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeResponse:
+    """Mimics the SDK response: .text, .usage_metadata, and iteration (or
+    async iteration) over chunks for streamed calls (usage is complete once
+    iteration ends)."""
+
+    def __init__(self, text, usage, chunks=None, chunk_delay=0.0):
+        self.text = text
+        self.usage_metadata = usage
+        self._chunks = chunks
+        self._chunk_delay = chunk_delay
+
+    def __iter__(self):
+        for i, chunk in enumerate(self._chunks or [self.text]):
+            if i and self._chunk_delay:
+                time.sleep(self._chunk_delay)
+            yield FakeChunk(chunk)
+
+    async def __aiter__(self):
+        for i, chunk in enumerate(self._chunks or [self.text]):
+            if i and self._chunk_delay:
+                await asyncio.sleep(self._chunk_delay)
+            yield FakeChunk(chunk)
+
+
+class FakeGenerativeModel:
+    """Local replacement for genai.GenerativeModel with configurable latency,
+    streaming chunk size and error rate. Output length scales with the prompt
+    (about output_ratio of its length, capped at max_output_chars). Calls
+    asking for a JSON response get a quiz in quiz_engine's format."""
+
+    def __init__(self, model_name, latency=0.05, first_chunk_latency=None, chunk_size=40,
+                 chunk_delay=0.005, error_rate=0.0, output_ratio=0.1, max_output_chars=4000, seed=None):
+        self.model_name = model_name
+        self.latency = latency
+        self.first_chunk_latency = latency if first_chunk_latency is None else first_chunk_latency
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.error_rate = error_rate
+        self.output_ratio = output_ratio
+        self.max_output_chars = max_output_chars
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def _output_for(self, prompt):
+        length = max(20, min(self.max_output_chars, int(len(prompt) * self.output_ratio)))
+        words = []
+        total = 0
+        while total < length:
+            word = f"w{len(words) % 97}"
+            words.append(word)
+            total += len(word) + 1
+        return f"[{self.model_name}] " + " ".join(words)
+
+    def _quiz_for(self, prompt):
+        match = re.search(r"Generate (\d+) multiple-choice", prompt)
+        count = int(match.group(1)) if match else 5
+        with self.lock:
+            tags = [self.random.randrange(10 ** 9) for _ in range(count)]
+        return json.dumps([{
+            "question": f"[{self.model_name}] Which statement about item {tag} is correct?",
+            "options": [f"Statement {tag}-{option}" for option in "ABCD"],
+            "answer": "ABCD"[tag % 4],
+            "explanation": f"The text states fact {tag}.",
+        } for tag in tags])
+
+    def _maybe_fail(self):
+        with self.lock:
+            self.calls += 1
+            failed = self.random.random() < self.error_rate
+        if failed:
+            raise FakeAPIError(503)
+
+    def _response(self, prompt, stream, generation_config):
+        if (generation_config or {}).get("response_mime_type") == "application/json":
+            text = self._quiz_for(prompt)
+        else:
+            text = self._output_for(prompt)
+        usage = FakeUsage(len(prompt) // 4 + 1, len(text) // 4 + 1)
+        if not stream:
+            return FakeResponse(text, usage)
+        chunks = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+        return FakeResponse(text, usage, chunks, self.chunk_delay)
+
+    def generate_content(self, prompt, stream=False, generation_config=None, request_options=None, **kwargs):
+        self._maybe_fail()
+        time.sleep(self.first_chunk_latency if stream else self.latency)
+        return self._response(prompt, stream, generation_config)
+
+    def count_tokens(self, contents, **kwargs):
+        time.sleep(self.latency / 10)
+        return FakeTokenCount(len(contents) // 4 + 1)
+
+    async def generate_content_async(self, prompt, stream=False, generation_config=None, request_options=None,
+                                     **kwargs):
+        self._maybe_fail()
+        await asyncio.sleep(self.first_chunk_latency if stream else self.latency)
+        return self._response(prompt, stream, generation_config)
+
+
+def install(**options):
+    """Makes gemini_client hand out FakeGenerativeModel instances built with options."""
+    gemini_client.set_model_factory(lambda model_name: FakeGenerativeModel(model_name, **options))
+
+
+def uninstall():
+    gemini_client.set_model_factory(None)
@@ -0,0 +1,117 @@
+import threading
+
+# Each API key gets its own SDK client manager, and every model is pinned to
+# its key's clients. genai.configure() would swap the process-wide default
+# client instead, and a model only picks that up on its first call, so a
+# request could go out on whichever key was configured last.
+_lock = threading.Lock()
+# Keys whose clients are kept; the least recently added beyond this are dropped.
+MAX_KEYS = 8
+_client_managers = {}
+_models = {}
+
+# The per-key clients rely on SDK internals (client._ClientManager and
+# GenerativeModel._client/_async_client); this is the release they are known
+# to work with.
+SUPPORTED_SDK = "google-generativeai==0.8.5"
+_sdk_checked = False
+
+# When set, models come from this callable (model_name -> model) instead of
+# the SDK; used by the benchmark suite's local stand-in.
+_model_factory = None
+
+
+def _incompatible_sdk(missing):
+    try:
+        from google.generativeai import __version__ as version
+    except ImportError:
+        return Exception(f"google-generativeai is not installed; install {SUPPORTED_SDK}")
+    return Exception(f"google-generativeai {version} has no {missing}; install {SUPPORTED_SDK}")
+
+
+def check_sdk():
+    """Raises an Exception naming SUPPORTED_SDK if the installed SDK lacks
+    the internals the per-key clients use."""
+    try:
+        from google.generativeai import GenerativeModel
+        from google.generativeai.client import _ClientManager
+    except ImportError:
+        raise _incompatible_sdk("client._ClientManager") from None
+    if not hasattr(_ClientManager, "get_default_client"):
+        raise _incompatible_sdk("_ClientManager.get_default_client")
+    model = GenerativeModel("gemini-2.5-flash")
+    for name in ("_client", "_async_client"):
+        if not hasattr(model, name):
+            raise _incompatible_sdk(f"GenerativeModel.{name}")
+
+
+def _client_manager(api_key):
+    manager = _client_managers.get(api_key)
+    if manager is None:
+        from google.generativeai.client import _ClientManager
+        manager = _ClientManager()
+        manager.configure(api_key=api_key)
+        _client_managers[api_key] = manager
+        while len(_client_managers) > MAX_KEYS:
+            dropped = next(iter(_client_managers))
+            del _client_managers[dropped]
+            for key in [k for k in _models if k[0] == dropped]:
+                del _models[key]
+    return manager
+
+
+def _pin_clients(model, manager):
+    if model._client is None:
+        model._client = manager.get_default_client("generative")
+    if model._async_client is None:
+        # Imported here so the desktop app, which only counts tokens, starts
+        # without loading asyncio.
+        import asyncio
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # gRPC's asyncio channel belongs to the loop it is created on;
+            # it is pinned the next time the model is fetched inside one.
+            return
+        model._async_client = manager.get_default_client("generative_async")
+
+
+def get_model(api_key, model_name):
+    """Returns a shared GenerativeModel for (api_key, model_name), bound to
+    that key's clients.
+
+    Models are created once and reused by every worker thread; the SDK's
+    generation client is safe to call concurrently.
+    """
+    with _lock:
+        model = _models.get((api_key, model_name))
+        if model is None and _model_factory is not None:
+            model = _model_factory(model_name)
+            _models[(api_key, model_name)] = model
+        if _model_factory is not None:
+            return model
+
+        global _sdk_checked
+        if not _sdk_checked:
+            check_sdk()
+            _sdk_checked = True
+        if model is None:
+            import google.generativeai as genai
+            model = genai.GenerativeModel(model_name)
+            _models[(api_key, model_name)] = model
+        _pin_clients(model, _client_manager(api_key))
+        return model
+
+
+def set_model_factory(factory):
+    """Routes get_model to factory(model_name); pass None to use the SDK again."""
+    global _model_factory
+    reset()
+    _model_factory = factory
+
+
+def reset():
+    """Drops all cached models and clients."""
+    with _lock:
+        _models.clear()
+        _client_managers.clear()
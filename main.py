@@ -1,4 +1,19 @@
-from desktop_ui import run_ui_setup
-
-if __name__ == '__main__':
-    run_ui_setup()
\ No newline at end of file
+import sys
+
+# Imported first so startup timings are measured from here.
+import metrics
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from batch_runner import main
+        sys.exit(main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from api_server import main
+        sys.exit(main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "vacuum":
+        from db_maintenance import main
+        sys.exit(main(sys.argv[2:]))
+
+    from desktop_ui import run_ui_setup
+    metrics.mark_startup("ui modules imported")
+    run_ui_setup()
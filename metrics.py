@@ -0,0 +1,145 @@
+import functools
+import inspect
+import math
+import threading
+import time
+from collections import defaultdict, deque
+
+# Recent durations per stage for this session; bounded so it never grows unchecked.
+MAX_SAMPLES = 1000
+
+_lock = threading.Lock()
+_timings = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+_counters = defaultdict(int)
+
+# Startup milestones, measured from when this module was first imported
+# (main.py imports it before anything else).
+_process_started = time.perf_counter()
+_startup = []
+
+
+def record_timing(stage, seconds):
+    with _lock:
+        _timings[stage].append(seconds)
+
+
+def increment(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an unsorted sequence (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def timed(stage):
+    """Decorator recording how long each call takes under `stage`. For
+    generator functions the time until the generator is exhausted or
+    closed is recorded, since that is when the work actually happens."""
+    def decorator(func):
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    yield from func(*args, **kwargs)
+                finally:
+                    record_timing(stage, time.perf_counter() - started)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_timing(stage, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def get_stage_snapshot():
+    """Returns {stage: (count, p50, p90, p99, max)} in seconds for this session."""
+    with _lock:
+        timings = {stage: list(values) for stage, values in _timings.items()}
+    return {
+        stage: (len(values), percentile(values, 0.5), percentile(values, 0.9),
+                percentile(values, 0.99), max(values))
+        for stage, values in timings.items() if values
+    }
+
+
+def get_counters():
+    with _lock:
+        return dict(_counters)
+
+
+def mark_startup(phase):
+    """Records that a startup phase finished, for the startup report."""
+    elapsed = time.perf_counter() - _process_started
+    with _lock:
+        _startup.append((phase, elapsed))
+
+
+def get_startup_report():
+    """Returns [(phase, seconds since start)] in the order phases finished."""
+    with _lock:
+        return list(_startup)
+
+
+class RunMetrics:
+    """Measurements for one process_text run; model calls may report into it
+    from several threads."""
+
+    def __init__(self, model, task_type, mode, input_text):
+        self.model = model
+        self.task_type = task_type
+        self.mode = mode
+        self.bytes_in = len(input_text.encode("utf-8"))
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.calls = 0
+        self.cache_hit = False
+        self.fallback_used = False
+        self.status = "ok"
+        self.started = time.perf_counter()
+        self.first_byte = None
+        self.total = None
+        self.lock = threading.Lock()
+
+    def mark_first_byte(self):
+        with self.lock:
+            if self.first_byte is None:
+                self.first_byte = time.perf_counter() - self.started
+
+    def add_usage(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        with self.lock:
+            self.calls += 1
+            if usage is not None:
+                self.tokens_in += getattr(usage, "prompt_token_count", 0) or 0
+                self.tokens_out += getattr(usage, "candidates_token_count", 0) or 0
+
+    def finish(self, status="ok"):
+        self.status = status
+        self.total = time.perf_counter() - self.started
+        if self.first_byte is None:
+            self.first_byte = self.total
+        increment("runs")
+        increment("cache_hits" if self.cache_hit else "cache_misses")
+        if self.fallback_used:
+            increment("fallbacks")
+        if status != "ok":
+            increment("errors")
+        # Imported here: database_manager itself is instrumented with this module.
+        from database_manager import save_run_metrics
+        try:
+            save_run_metrics(self)
+        except Exception:
+            # Metrics must never break the request they describe.
+            increment("metrics_write_errors")
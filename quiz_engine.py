@@ -0,0 +1,360 @@
+import asyncio
+import json
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import async_engine
+import metrics
+import summarizer_logic
+
+# One model call writes at most this many questions; larger quizzes are split
+# into shards over different sections of the document and run in parallel.
+QUESTIONS_PER_SHARD = 20
+MAX_SHARD_WORKERS = 10
+MAX_QUESTIONS = 500
+# Shards that come back short (invalid or duplicate questions) are topped up
+# this many times before the quiz is returned with fewer questions.
+TOP_UP_ROUNDS = 1
+# Existing question stems listed in a top-up prompt so the model avoids them.
+MAX_AVOID_LISTED = 40
+
+JSON_CONFIG = {"response_mime_type": "application/json"}
+OPTION_LABELS = "ABCD"
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+_NON_WORD = re.compile(r"\W+")
+
+
+def build_quiz_prompt(section_text, num_questions, difficulty, part=None, avoid=None):
+    if part is not None:
+        index, total = part
+        scope = f"The text below is section {index} of {total} of a longer document; ask only about this section."
+    else:
+        scope = "Ask only about the text below."
+    avoid_text = ""
+    if avoid:
+        listed = "\n".join(f"- {question}" for question in avoid[:MAX_AVOID_LISTED])
+        avoid_text = f"\nDo not repeat or rephrase any of these existing questions:\n{listed}\n"
+    return f"""
+            Generate {num_questions} multiple-choice questions (MCQs) based strictly on the text provided below.
+            Difficulty Level: {difficulty}.
+            {scope}
+            {avoid_text}
+            Respond with a JSON array only. Each element must be an object with:
+            "question": the question text,
+            "options": exactly 4 answer options as strings (without A/B/C/D labels),
+            "answer": the letter of the correct option ("A", "B", "C" or "D"),
+            "explanation": one sentence explaining why the answer is correct.
+
+            TEXT:
+            {section_text}
+            """
+
+
+def split_sections(text, count):
+    """Splits text into count consecutive sections on paragraph boundaries.
+    Short documents yield fewer sections, which shards then share."""
+    target = max(2000, math.ceil(len(text) / count))
+    chunks = summarizer_logic.split_into_chunks(text, target)
+    if len(chunks) <= count:
+        return chunks or [text]
+    # More chunks than shards: group neighbours evenly.
+    per_section = len(chunks) / count
+    return ["\n\n".join(chunks[round(i * per_section):round((i + 1) * per_section)]) for i in range(count)]
+
+
+def shard_sizes(num_questions, shard_count):
+    base, extra = divmod(num_questions, shard_count)
+    return [base + (1 if i < extra else 0) for i in range(shard_count)]
+
+
+def _normalize_question(text):
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def _answer_index(answer, options):
+    if isinstance(answer, int) and 0 <= answer < len(options):
+        return answer
+    if not isinstance(answer, str):
+        return None
+    answer = answer.strip()
+    letter = answer.rstrip(").:").upper()
+    if len(letter) == 1 and letter in OPTION_LABELS:
+        return OPTION_LABELS.index(letter)
+    for i, option in enumerate(options):
+        if answer.lower() == option.lower():
+            return i
+    return None
+
+
+def parse_questions(raw):
+    """Parses a model's JSON answer into validated question dicts
+    {"question", "options", "answer" (option index), "explanation"}; invalid
+    entries are dropped."""
+    try:
+        data = json.loads(_FENCE.sub("", raw.strip()))
+    except ValueError:
+        return []
+    if isinstance(data, dict):
+        data = data.get("questions", [])
+    if not isinstance(data, list):
+        return []
+
+    questions = []
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        question = item.get("question")
+        options = item.get("options")
+        if not isinstance(question, str) or not question.strip() or not isinstance(options, list):
+            continue
+        options = [str(option).strip() for option in options]
+        if len(options) != 4 or not all(options) or len({o.lower() for o in options}) != 4:
+            continue
+        answer = _answer_index(item.get("answer"), options)
+        if answer is None:
+            continue
+        explanation = item.get("explanation")
+        questions.append({
+            "question": question.strip(),
+            "options": options,
+            "answer": answer,
+            "explanation": explanation.strip() if isinstance(explanation, str) else "",
+        })
+    return questions
+
+
+def _shard_prompt(shard, difficulty, avoid):
+    section, part, count = shard
+    return build_quiz_prompt(section, count, difficulty, part, avoid)
+
+
+def _run_shards(api_key, target_model, shards, difficulty, max_workers, run, avoid=None):
+    """Runs (section, part, count) shards in parallel. Returns a
+    (questions, used_fallback, error) result per shard, in shard order."""
+    def run_shard(shard):
+        try:
+            raw, used_fallback = summarizer_logic._generate(
+                api_key, _shard_prompt(shard, difficulty, avoid), target_model, run=run,
+                generation_config=JSON_CONFIG
+            )
+        except Exception as e:
+            return [], False, e
+        # A shard may overshoot; keep only what it was asked for.
+        return parse_questions(raw)[:shard[2]], used_fallback, None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(shards)))) as executor:
+        return list(executor.map(run_shard, shards))
+
+
+async def _run_shards_async(api_key, target_model, shards, difficulty, max_workers, run, avoid=None):
+    """_run_shards on the event loop, with at most max_workers shards in flight."""
+    limit = asyncio.Semaphore(max_workers)
+
+    async def run_shard(shard):
+        try:
+            async with limit:
+                raw, used_fallback = await async_engine.generate_async(
+                    api_key, _shard_prompt(shard, difficulty, avoid), target_model, run=run,
+                    generation_config=JSON_CONFIG
+                )
+        except Exception as e:
+            return [], False, e
+        return parse_questions(raw)[:shard[2]], used_fallback, None
+
+    return await asyncio.gather(*[run_shard(shard) for shard in shards])
+
+
+def _plan_shards(sections, num_questions):
+    shard_count = math.ceil(num_questions / QUESTIONS_PER_SHARD)
+    total = len(sections)
+    return [
+        (sections[i % total], (i % total + 1, total) if total > 1 else None, count)
+        for i, count in enumerate(shard_sizes(num_questions, shard_count))
+    ]
+
+
+class _QuestionCollector:
+    """Gathers shard results across rounds, keeping the first copy of each
+    question. Shards that come back short are topped up on their own section."""
+
+    def __init__(self, input_text, num_questions):
+        self.num_questions = num_questions
+        self.sections = split_sections(input_text, math.ceil(num_questions / QUESTIONS_PER_SHARD))
+        self.collected = []
+        self.seen = set()
+        self.used_fallback = False
+        self.errors = []
+        self.short = _plan_shards(self.sections, num_questions)
+
+    def next_round(self, round_number):
+        """Returns (shards, avoid) for the next round, or None when done."""
+        if not self.short or round_number > TOP_UP_ROUNDS:
+            return None
+        avoid = [question["question"] for question in self.collected] if round_number else None
+        return self.short, avoid
+
+    def add(self, shard_results):
+        """Takes the results of the shards next_round returned, in order."""
+        short = []
+        for shard, (questions, fallback, error) in zip(self.short, shard_results):
+            self.used_fallback = self.used_fallback or fallback
+            if error is not None:
+                self.errors.append(error)
+            added = 0
+            for question in questions:
+                key = _normalize_question(question["question"])
+                if key not in self.seen:
+                    self.seen.add(key)
+                    self.collected.append(question)
+                    added += 1
+            section, part, count = shard
+            if added < count:
+                short.append((section, part, count - added))
+        self.short = short
+
+    def result(self):
+        if not self.collected:
+            if self.errors:
+                raise self.errors[0]
+            raise Exception("The model returned no valid questions")
+        return self.collected[:self.num_questions], self.used_fallback
+
+
+@metrics.timed("quiz.generate")
+def generate_questions(api_key, input_text, target_model, num_questions=5, difficulty="Medium",
+                       max_workers=MAX_SHARD_WORKERS, run=None):
+    """Generates up to num_questions validated, de-duplicated questions.
+    Returns (questions, used_fallback); raises if no shard produced any."""
+    collector = _QuestionCollector(input_text, num_questions)
+    round_number = 0
+    planned = collector.next_round(round_number)
+    while planned is not None:
+        shards, avoid = planned
+        collector.add(_run_shards(api_key, target_model, shards, difficulty, max_workers, run, avoid))
+        round_number += 1
+        planned = collector.next_round(round_number)
+    return collector.result()
+
+
+async def generate_questions_async(api_key, input_text, target_model, num_questions=5, difficulty="Medium",
+                                   max_workers=MAX_SHARD_WORKERS, run=None):
+    """generate_questions on the event loop (see async_engine)."""
+    collector = _QuestionCollector(input_text, num_questions)
+    round_number = 0
+    planned = collector.next_round(round_number)
+    while planned is not None:
+        shards, avoid = planned
+        collector.add(await _run_shards_async(api_key, target_model, shards, difficulty, max_workers, run, avoid))
+        round_number += 1
+        planned = collector.next_round(round_number)
+    return collector.result()
+
+
+def _lookup_quiz(run, use_cache, input_text, mode, num_questions, difficulty, target_model):
+    """(key, questions) from the cache; questions is None on a miss."""
+    key, cached = summarizer_logic.lookup_result(
+        run, use_cache, input_text, mode, "mcq-json", num_questions, difficulty, target_model
+    )
+    if cached is None:
+        return key, None
+    data = json.loads(cached)
+    if isinstance(data, dict):
+        # Older entries kept a fallback flag; fallback answers count as misses.
+        if data["used_fallback"]:
+            run.cache_hit = False
+            return key, None
+        data = data["questions"]
+    return key, data
+
+
+def _store_quiz(key, questions, used_fallback):
+    summarizer_logic.store_result(key, json.dumps(questions, ensure_ascii=False), used_fallback)
+
+
+def shortfall_notes(questions, num_questions):
+    """A note when shards kept failing and the quiz has fewer questions than asked."""
+    if len(questions) >= num_questions:
+        return []
+    return [f"Only {len(questions)} of the {num_questions} requested questions could be generated"]
+
+
+def _quiz_notes(questions, num_questions, used_fallback, route):
+    """The notes process_text appends, in the same order."""
+    notes = shortfall_notes(questions, num_questions)
+    if used_fallback:
+        notes.append(summarizer_logic.FALLBACK_NOTE)
+    if route is not None and route.downgraded:
+        notes.append(route.note())
+    return notes
+
+
+def generate_quiz(input_text, mode="speed", api_key=None, num_questions=5, difficulty="Medium",
+                  max_workers=MAX_SHARD_WORKERS, use_cache=True, auto_route=True):
+    """Structured counterpart of process_text(task_type="mcq"): returns
+    (questions, notes), the question dicts and the notes process_text would
+    append to its text (see quiz_output), and raises on failure."""
+    active_key, target_model, _, route, run = summarizer_logic.start_task(
+        input_text, mode, "mcq", api_key, num_questions, False, None, None, auto_route
+    )
+    try:
+        used_fallback = False
+        cache_key, questions = _lookup_quiz(
+            run, use_cache, input_text, mode, num_questions, difficulty, target_model
+        )
+        if questions is None:
+            questions, used_fallback = generate_questions(
+                active_key, input_text, target_model, num_questions, difficulty, max_workers, run
+            )
+            _store_quiz(cache_key, questions, used_fallback)
+    except Exception:
+        run.finish("error")
+        raise
+    run.finish()
+    return questions, _quiz_notes(questions, num_questions, used_fallback, route)
+
+
+async def generate_quiz_async(input_text, mode="speed", api_key=None, num_questions=5, difficulty="Medium",
+                              max_workers=MAX_SHARD_WORKERS, use_cache=True, auto_route=True):
+    """generate_quiz on the event loop."""
+    active_key, target_model, _, route, run = summarizer_logic.start_task(
+        input_text, mode, "mcq", api_key, num_questions, False, None, None, auto_route
+    )
+    try:
+        used_fallback = False
+        cache_key, questions = await asyncio.to_thread(
+            _lookup_quiz, run, use_cache, input_text, mode, num_questions, difficulty, target_model
+        )
+        if questions is None:
+            questions, used_fallback = await generate_questions_async(
+                active_key, input_text, target_model, num_questions, difficulty, max_workers, run
+            )
+            await asyncio.to_thread(_store_quiz, cache_key, questions, used_fallback)
+    except Exception:
+        await asyncio.to_thread(run.finish, "error")
+        raise
+    await asyncio.to_thread(run.finish)
+    return questions, _quiz_notes(questions, num_questions, used_fallback, route)
+
+
+def quiz_output(questions, notes=()):
+    """format_quiz with generate_quiz's notes appended, as process_text would."""
+    text = format_quiz(questions)
+    for note in notes:
+        text = summarizer_logic.add_note(text, note)
+    return text
+
+
+def format_quiz(questions):
+    """Renders questions as the plain-text quiz shown in the app."""
+    blocks = []
+    for number, question in enumerate(questions, 1):
+        lines = [f"{number}. {question['question']}"]
+        lines.extend(f"   {label}) {option}" for label, option in zip(OPTION_LABELS, question["options"]))
+        answer = f"   Correct Answer: {OPTION_LABELS[question['answer']]}"
+        if question.get("explanation"):
+            answer += f" - {question['explanation']}"
+        lines.append(answer)
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
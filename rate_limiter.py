@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """Classic token bucket: holds up to `capacity` tokens, refilled at `capacity` per `period` seconds."""
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` tokens are available (0 if they are now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Blocks callers so requests stay within requests-per-minute and tokens-per-minute quotas."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.lock = threading.Lock()
+
+    def _try_take(self, tokens):
+        """Takes one request and `tokens` tokens if available; otherwise returns the wait in seconds."""
+        with self.lock:
+            now = time.monotonic()
+            wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+            if wait == 0:
+                self.requests.take(1)
+                self.tokens.take(tokens)
+            return wait
+
+    def acquire(self, tokens):
+        while True:
+            wait = self._try_take(tokens)
+            if wait == 0:
+                return
+            time.sleep(min(wait, 1.0))
+
+    async def acquire_async(self, tokens):
+        while True:
+            wait = self._try_take(tokens)
+            if wait == 0:
+                return
+            await asyncio.sleep(min(wait, 1.0))
+
+
+# Process-wide limiter applied to every model call; None means unthrottled.
+_active = None
+
+
+def set_limits(requests_per_minute, tokens_per_minute):
+    global _active
+    _active = RateLimiter(requests_per_minute, tokens_per_minute)
+
+
+def clear_limits():
+    global _active
+    _active = None
+
+
+def throttle(tokens):
+    limiter = _active
+    if limiter is not None:
+        limiter.acquire(tokens)
+
+
+async def throttle_async(tokens):
+    limiter = _active
+    if limiter is not None:
+        await limiter.acquire_async(tokens)
@@ -0,0 +1,195 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# HTTP-style status codes worth retrying: quota exhaustion and server-side failures.
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Stops calling a model after repeated failures until a cool-down has passed.
+
+    After the cool-down one trial call is let through (half-open); its outcome
+    closes the circuit again or restarts the cool-down.
+    """
+
+    def __init__(self, failure_threshold=3, cooldown=60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def release_trial(self):
+        """Ends a call whose failure says nothing about the model's health
+        (a bad request, an invalid key, cancellation) without changing state."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def is_open(self):
+        with self.lock:
+            return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker()
+        return breaker
+
+
+def is_retryable(error):
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(error, "code", None)
+    if callable(code):
+        # gRPC errors expose code() returning a StatusCode enum.
+        code = getattr(code(), "name", None)
+        return code in ("RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL")
+    return code in RETRYABLE_CODES
+
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=30.0):
+    """Full-jitter exponential backoff: uniform in [0, min(max_delay, base * 2^attempt)]."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def call_with_retry(fn, retries=3, base_delay=1.0, max_delay=30.0, should_retry=is_retryable):
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= retries or not should_retry(e):
+                raise
+            time.sleep(backoff_delay(attempt, base_delay, max_delay))
+            attempt += 1
+
+
+async def call_with_retry_async(fn, retries=3, base_delay=1.0, max_delay=30.0, should_retry=is_retryable):
+    """call_with_retry for a coroutine function; waits without blocking the event loop."""
+    attempt = 0
+    while True:
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt >= retries or not should_retry(e):
+                raise
+            await asyncio.sleep(backoff_delay(attempt, base_delay, max_delay))
+            attempt += 1
+
+
+def _record_error(breaker, error):
+    # Breakers are shared by every caller of a model, so only errors that point
+    # at the model or service (timeouts, 429, 5xx) count; a bad key or request
+    # from one caller must not lock the others out.
+    if is_retryable(error):
+        breaker.record_failure()
+    else:
+        breaker.release_trial()
+
+
+def call_with_breaker(name, fn):
+    """Runs fn unless the circuit for name is open, recording the outcome."""
+    breaker = get_breaker(name)
+    if not breaker.allow():
+        raise CircuitOpenError(f"'{name}' is temporarily skipped after repeated failures")
+    try:
+        result = fn()
+    except BaseException as e:
+        _record_error(breaker, e)
+        raise
+    breaker.record_success()
+    return result
+
+
+async def call_with_breaker_async(name, fn):
+    """call_with_breaker for a coroutine function; shares the same breakers."""
+    breaker = get_breaker(name)
+    if not breaker.allow():
+        raise CircuitOpenError(f"'{name}' is temporarily skipped after repeated failures")
+    try:
+        result = await fn()
+    except BaseException as e:
+        # Includes cancellation, e.g. the losing side of a hedged call.
+        _record_error(breaker, e)
+        raise
+    breaker.record_success()
+    return result
+
+
+_hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+
+def hedged_call(primary, backup, hedge_after):
+    """Starts primary; if it has not finished after hedge_after seconds (or
+    fails), starts backup too. Returns (result, used_backup) from whichever
+    succeeds first; if both fail, the backup's error is raised."""
+    primary_future = _hedge_pool.submit(primary)
+    done, _ = wait([primary_future], timeout=hedge_after)
+    if done and primary_future.exception() is None:
+        return primary_future.result(), False
+
+    backup_future = _hedge_pool.submit(backup)
+    pending = {primary_future, backup_future}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result(), future is backup_future
+    raise backup_future.exception()
+
+
+async def hedged_call_async(primary, backup, hedge_after):
+    """hedged_call for coroutine functions; the losing call is cancelled."""
+    primary_task = asyncio.ensure_future(primary())
+    done, _ = await asyncio.wait([primary_task], timeout=hedge_after)
+    if done and primary_task.exception() is None:
+        return primary_task.result(), False
+
+    backup_task = asyncio.ensure_future(backup())
+    pending = {primary_task, backup_task}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result(), task is backup_task
+        raise backup_task.exception()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from database_manager import DB_NAME
+
+# Stored next to the history database.
+CACHE_DB_NAME = os.path.join(os.path.dirname(os.path.abspath(DB_NAME)), "result_cache.db")
+
+MAX_ENTRIES = 2000
+MAX_BYTES = 64 * 1024 * 1024
+MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+
+_lock = threading.Lock()
+_conn = None
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def _get_connection():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(CACHE_DB_NAME, check_same_thread=False)
+        _conn.execute('''
+            CREATE TABLE IF NOT EXISTS result_cache (
+                key TEXT PRIMARY KEY,
+                result TEXT,
+                size INTEGER,
+                created_at REAL,
+                last_access REAL
+            )
+        ''')
+        _conn.execute('CREATE INDEX IF NOT EXISTS idx_result_cache_access ON result_cache (last_access)')
+        _conn.commit()
+    return _conn
+
+
+def normalize_text(text):
+    """Normalizes unicode, line endings and trailing whitespace so cosmetic
+    differences do not defeat the cache."""
+    text = unicodedata.normalize("NFC", text)
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def make_key(input_text, mode, task_type, num_questions, difficulty, model_name):
+    payload = json.dumps(
+        [normalize_text(input_text), mode, task_type, num_questions, difficulty, model_name],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_cached(key):
+    """Returns the cached result for key, or None on a miss."""
+    with _lock:
+        conn = _get_connection()
+        row = conn.execute(
+            'SELECT result, created_at FROM result_cache WHERE key = ?', (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None or now - row[1] > MAX_AGE_SECONDS:
+            _stats["misses"] += 1
+            return None
+        conn.execute('UPDATE result_cache SET last_access = ? WHERE key = ?', (now, key))
+        conn.commit()
+        _stats["hits"] += 1
+        return row[0]
+
+
+def store(key, result):
+    with _lock:
+        conn = _get_connection()
+        now = time.time()
+        conn.execute('''
+            INSERT OR REPLACE INTO result_cache (key, result, size, created_at, last_access)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (key, result, len(result.encode("utf-8")), now, now))
+        _evict(conn, now)
+        conn.commit()
+
+
+def _evict(conn, now):
+    """Drops expired entries, then least recently used ones over the caps."""
+    removed = conn.execute(
+        'DELETE FROM result_cache WHERE created_at < ?', (now - MAX_AGE_SECONDS,)
+    ).rowcount
+
+    count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM result_cache').fetchone()
+    if count > MAX_ENTRIES or total > MAX_BYTES:
+        rows = conn.execute('SELECT key, size FROM result_cache ORDER BY last_access ASC').fetchall()
+        stale = []
+        for key, size in rows:
+            if count <= MAX_ENTRIES and total <= MAX_BYTES:
+                break
+            stale.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany('DELETE FROM result_cache WHERE key = ?', stale)
+        removed += len(stale)
+
+    _stats["evictions"] += removed
+
+
+def get_stats():
+    with _lock:
+        conn = _get_connection()
+        count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM result_cache').fetchone()
+        return dict(_stats, entries=count, bytes=total)
+
+
+def clear():
+    with _lock:
+        conn = _get_connection()
+        conn.execute('DELETE FROM result_cache')
+        conn.commit()
@@ -1,55 +1,435 @@
-import google.generativeai as genai
+import hashlib
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 
-def process_text(input_text, mode="speed", task_type="summary", api_key=None, num_questions=5, difficulty="Medium"):
-    active_key = api_key or os.environ.get("GEMINI_API_KEY")
+import gemini_client
+import metrics
+import rate_limiter
+import resilience
+import result_cache
+import token_budget
+from token_budget import estimate_tokens
 
-    if not active_key:
-        return "Error: No API Key provided. Please enter it manually or set the GEMINI_API_KEY environment variable."
-    
-    active_key = active_key.strip()
+FALLBACK_MODEL = "gemini-2.0-flash"
+FALLBACK_NOTE = f"Generated using fallback model '{FALLBACK_MODEL}'"
+
+# Inputs longer than this are split into chunks when chunked mode is on.
+CHUNK_CHAR_LIMIT = 24000
+MAX_CHUNK_WORKERS = 4
+
+# Per-request timeout (seconds) and retries on 429/5xx before falling back.
+REQUEST_TIMEOUT = 120
+MAX_RETRIES = 3
+# When set, a non-streamed call that is still running after this many seconds
+# also sends the request to the fallback model and keeps the first answer.
+HEDGE_AFTER_SECONDS = None
+
+_PARAGRAPH_BREAK = re.compile(r"\f|\n\s*\n")
+
+
+@metrics.timed("prompt.build")
+def build_prompt(input_text):
+    """Single-call summary prompt; quizzes are prompted by quiz_engine."""
+    return f"""
+            Summarize the following text comprehensively. Capture the main points and key details.
 
-    try:
-        genai.configure(api_key=active_key)
-        
-        if mode == "speed":
-            target_model = "gemini-2.5-flash"
-        else:
-            target_model = "gemini-2.5-pro"
-        
-        if task_type == "mcq":
-            prompt = f"""
-            Generate {num_questions} multiple-choice questions (MCQs) based strictly on the text provided below.
-            Difficulty Level: {difficulty}.
-            
-            Format each question clearly with:
-            1. The Question
-            2. 4 Options (labeled A, B, C, D)
-            3. The Correct Answer (clearly indicated at the end)
-            
             TEXT:
             {input_text}
             """
-        else:
-            prompt = f"""
-            Summarize the following text comprehensively. Capture the main points and key details.
-            
+
+
+# Partial summaries are cached by chunk content alone, so the same chunk keeps
+# its summary when it moves to a different position in an edited document.
+def build_chunk_prompt(chunk_text, index, total):
+    return f"""
+            The text below is part {index} of {total} of a longer document.
+            Summarize this part comprehensively, keeping every main point and key detail
+            so the partial summaries can later be merged.
+
             TEXT:
-            {input_text}
+            {chunk_text}
+            """
+
+
+def build_reduce_prompt(partial_summaries):
+    joined = "\n\n---\n\n".join(partial_summaries)
+    return f"""
+            The following are summaries of consecutive parts of one document, in order.
+            Combine them into a single comprehensive summary. Remove repetition, keep the
+            main points and key details, and preserve the order of the original document.
+
+            PARTIAL SUMMARIES:
+            {joined}
             """
-        # ------------------------
+
+
+def _split_pieces(text, max_chars):
+    """Page/paragraph pieces of text, none longer than max_chars."""
+    pieces = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        # Oversized paragraph: fall back to line boundaries, then a hard cut.
+        for line in paragraph.splitlines():
+            while len(line) > max_chars:
+                pieces.append(line[:max_chars])
+                line = line[max_chars:]
+            if line.strip():
+                pieces.append(line)
+    return pieces
+
+
+def split_into_chunks(text, max_chars=CHUNK_CHAR_LIMIT):
+    """Splits text on page/paragraph boundaries into chunks of at most max_chars."""
+    chunks = []
+    current = []
+    current_len = 0
+    for piece in _split_pieces(text, max_chars):
+        if current and current_len + len(piece) + 2 > max_chars:
+            chunks.append("\n\n".join(current))
+            current = []
+            current_len = 0
+        current.append(piece)
+        current_len += len(piece) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _is_boundary(piece, spread):
+    # Cut after a piece with probability len(piece) / spread, decided by its hash.
+    digest = hashlib.blake2b(piece.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64 < len(piece) / spread
+
+
+def split_into_stable_chunks(text, max_chars=CHUNK_CHAR_LIMIT):
+    """Like split_into_chunks, but where a chunk ends depends only on the
+    paragraphs around it, not on everything before it: editing or inserting a
+    paragraph changes its own chunk (and at most the next one) while the
+    others come out identical. Chunks average about three quarters of max_chars."""
+    min_chars = max_chars // 2
+    spread = max(1, max_chars // 4)
+    chunks = []
+    current = []
+    current_len = 0
+    for piece in _split_pieces(text, max_chars):
+        if current and current_len + len(piece) + 2 > max_chars:
+            chunks.append("\n\n".join(current))
+            current = []
+            current_len = 0
+        current.append(piece)
+        current_len += len(piece) + 2
+        if current_len >= min_chars and _is_boundary(piece, spread):
+            chunks.append("\n\n".join(current))
+            current = []
+            current_len = 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+@metrics.timed("model.call")
+def _call_model(api_key, model_name, prompt, on_chunk=None, run=None, generation_config=None):
+    rate_limiter.throttle(estimate_tokens(prompt))
+    model = gemini_client.get_model(api_key, model_name)
+    request_options = {"timeout": REQUEST_TIMEOUT}
+    if on_chunk is None:
+        response = model.generate_content(prompt, generation_config=generation_config,
+                                          request_options=request_options)
+        text = response.text
+        if run is not None:
+            run.mark_first_byte()
+            run.add_usage(response)
+        return text
+
+    parts = []
+    response = model.generate_content(prompt, stream=True, generation_config=generation_config,
+                                      request_options=request_options)
+    for chunk in response:
+        try:
+            piece = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. safety metadata) carry nothing to show.
+            continue
+        if piece:
+            if run is not None:
+                run.mark_first_byte()
+            parts.append(piece)
+            on_chunk(piece)
+    if run is not None:
+        run.add_usage(response)
+    return "".join(parts)
+
+
+def _resilient_call(api_key, model_name, prompt, on_chunk=None, run=None, generation_config=None):
+    """One model call with retries on 429/5xx/timeouts, behind the model's circuit breaker."""
+    streamed = []
+
+    def track(piece):
+        streamed.append(piece)
+        on_chunk(piece)
+
+    def should_retry(error):
+        # Once text has reached the user, retrying would duplicate it.
+        return not streamed and resilience.is_retryable(error)
+
+    return resilience.call_with_breaker(model_name, lambda: resilience.call_with_retry(
+        lambda: _call_model(api_key, model_name, prompt, track if on_chunk else None, run, generation_config),
+        retries=MAX_RETRIES, should_retry=should_retry
+    ))
+
+
+def _generate(api_key, prompt, target_model, on_chunk=None, run=None, generation_config=None):
+    """Returns (text, used_fallback) for a single model call. When on_chunk is
+    given the response is streamed and on_chunk receives each text piece;
+    generation_config is passed to the SDK as-is (e.g. a JSON response type).
+
+    The fallback model is used when the primary fails or its circuit is open;
+    with HEDGE_AFTER_SECONDS set, non-streamed calls also start the fallback
+    once the primary is slower than that and keep whichever answers first.
+    A primary that fails after streaming text raises instead of falling back.
+    """
+    if on_chunk is None and HEDGE_AFTER_SECONDS is not None:
+        text, used_fallback = resilience.hedged_call(
+            lambda: _resilient_call(api_key, target_model, prompt, run=run, generation_config=generation_config),
+            lambda: _resilient_call(api_key, FALLBACK_MODEL, prompt, run=run, generation_config=generation_config),
+            HEDGE_AFTER_SECONDS
+        )
+    else:
+        streamed = []
+
+        def track(piece):
+            streamed.append(piece)
+            on_chunk(piece)
 
         try:
-            model = genai.GenerativeModel(target_model)
-            response = model.generate_content(prompt)
-            return response.text
-            
-        except Exception as first_error:
-            # Fallback logic
-            fallback_model = "gemini-2.0-flash"
-            model = genai.GenerativeModel(fallback_model)
-            response = model.generate_content(prompt)
-            return f"{response.text}\n\n(Note: Generated using fallback model '{fallback_model}')"
+            text = _resilient_call(api_key, target_model, prompt, track if on_chunk else None, run, generation_config)
+            used_fallback = False
+        except Exception:
+            if streamed:
+                # The user already has part of this answer; the fallback's
+                # would be appended to it.
+                raise
+            text = _resilient_call(api_key, FALLBACK_MODEL, prompt, on_chunk, run, generation_config)
+            used_fallback = True
+    if used_fallback and run is not None:
+        run.fallback_used = True
+    return text, used_fallback
+
+
+def _group_summaries(summaries, max_chars):
+    groups = []
+    current = []
+    current_len = 0
+    for summary in summaries:
+        if current and current_len + len(summary) > max_chars:
+            groups.append(current)
+            current = []
+            current_len = 0
+        current.append(summary)
+        current_len += len(summary)
+    groups.append(current)
+    if len(groups) == len(summaries) > 1:
+        # Every summary is too large to share a prompt; merge two at a time.
+        groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+    return groups
 
+
+def _lookup_partial(use_cache, source_text, mode, kind, target_model):
+    """(key, cached text) of a chunk summary or merge; key is None without use_cache."""
+    if not use_cache:
+        return None, None
+    key = result_cache.make_key(source_text, mode, kind, None, None, target_model)
+    cached = result_cache.get_cached(key)
+    metrics.increment("partial_cache_hits" if cached is not None else "partial_cache_misses")
+    return key, cached
+
+
+def _store_partial(key, text, fallback):
+    # Fallback answers are not kept, so the next run asks the primary model again.
+    if key is not None and not fallback:
+        result_cache.store(key, text)
+
+
+def _summarize_chunked(api_key, input_text, mode, target_model, max_chars, max_workers, use_cache=True,
+                       on_chunk=None, run=None):
+    """Map-reduce summary: chunks are summarized in parallel, then merged
+    (hierarchically while the partial summaries do not fit in one prompt).
+    Only the final merge is streamed to on_chunk.
+
+    With use_cache, chunk summaries and intermediate merges are cached by
+    their input, so re-running an edited document only summarizes the chunks
+    that changed before merging again."""
+    def cached_generate(kind, source_text, prompt):
+        key, cached = _lookup_partial(use_cache, source_text, mode, kind, target_model)
+        if cached is not None:
+            return cached, False
+        text, fallback = _generate(api_key, prompt, target_model, run=run)
+        _store_partial(key, text, fallback)
+        return text, fallback
+
+    chunks = split_into_stable_chunks(input_text, max_chars)
+    total = len(chunks)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(
+            lambda i: cached_generate("summary-chunk", chunks[i], build_chunk_prompt(chunks[i], i + 1, total)),
+            range(total)
+        ))
+        used_fallback = any(fallback for _, fallback in results)
+        summaries = [text for text, _ in results]
+
+        while len(summaries) > 1:
+            groups = _group_summaries(summaries, max_chars)
+            if len(groups) == 1:
+                text, fallback = _generate(api_key, build_reduce_prompt(groups[0]), target_model, on_chunk, run)
+                return text, used_fallback or fallback
+            results = list(executor.map(
+                lambda g: cached_generate("summary-merge", "\n\n---\n\n".join(g), build_reduce_prompt(g)), groups
+            ))
+            used_fallback = used_fallback or any(fallback for _, fallback in results)
+            summaries = [text for text, _ in results]
+
+    return summaries[0], used_fallback
+
+
+class MissingApiKeyError(Exception):
+    pass
+
+
+def resolve_api_key(api_key=None):
+    """Returns the key to use (argument first, then GEMINI_API_KEY) or raises MissingApiKeyError."""
+    active_key = api_key or os.environ.get("GEMINI_API_KEY")
+    if not active_key:
+        raise MissingApiKeyError(
+            "No API Key provided. Please enter it manually or set the GEMINI_API_KEY environment variable."
+        )
+    return active_key.strip()
+
+
+def model_for_mode(mode):
+    return "gemini-2.5-flash" if mode == "speed" else "gemini-2.5-pro"
+
+
+def start_task(input_text, mode, task_type, api_key, num_questions, chunked, max_chunk_chars, max_workers,
+               auto_route):
+    """Resolves the key and plans a request, for the sync and async entry points
+    alike. Returns (active_key, target_model, chunked, route, run); route is
+    None when auto_route is off."""
+    active_key = resolve_api_key(api_key)
+    if auto_route:
+        route = token_budget.plan_route(
+            len(input_text), mode, task_type, num_questions, chunked=chunked,
+            max_chunk_chars=max_chunk_chars, max_workers=max_workers
+        )
+        if route.downgraded:
+            metrics.increment("route_downgrades")
+        target_model, chunked = route.model, chunked or route.strategy == "chunked"
+    else:
+        route, target_model = None, model_for_mode(mode)
+    return active_key, target_model, chunked, route, metrics.RunMetrics(target_model, task_type, mode, input_text)
+
+
+def lookup_result(run, use_cache, input_text, mode, task_type, num_questions, difficulty, target_model):
+    """(key, cached result) of a whole request, marking run as a cache hit;
+    key is None without use_cache. Store the result with store_result."""
+    if not use_cache:
+        return None, None
+    key = result_cache.make_key(input_text, mode, task_type, num_questions, difficulty, target_model)
+    cached = result_cache.get_cached(key)
+    if cached is not None:
+        run.cache_hit = True
+    return key, cached
+
+
+def store_result(key, result, used_fallback=False):
+    # As with partial summaries, fallback answers are not kept under the primary
+    # model's key, so the next request asks the primary model again.
+    if key is not None and not used_fallback:
+        result_cache.store(key, result)
+
+
+def add_note(text, note):
+    return f"{text}\n\n(Note: {note})"
+
+
+def add_route_note(text, route):
+    if route is not None and route.downgraded:
+        return add_note(text, route.note())
+    return text
+
+
+def add_fallback_note(text, used_fallback):
+    return add_note(text, FALLBACK_NOTE) if used_fallback else text
+
+
+@metrics.timed("process_text")
+def run_task(input_text, mode="speed", task_type="summary", api_key=None, num_questions=5, difficulty="Medium",
+             chunked=False, max_chunk_chars=CHUNK_CHAR_LIMIT, max_workers=MAX_CHUNK_WORKERS, use_cache=True,
+             on_chunk=None, auto_route=True):
+    """Same as process_text, but raises on failure instead of returning an error message.
+
+    With auto_route, token_budget picks the route: inputs over the token budget
+    run on the speed-mode model, and summaries too large for one call are chunked.
+    """
+    active_key, target_model, chunked, route, run = start_task(
+        input_text, mode, task_type, api_key, num_questions, chunked, max_chunk_chars, max_workers, auto_route
+    )
+    try:
+        text = _execute(
+            run, active_key, input_text, mode, task_type, target_model, num_questions, difficulty,
+            chunked, max_chunk_chars, max_workers, use_cache, on_chunk
+        )
+    except Exception:
+        run.finish("error")
+        raise
+    run.finish()
+    return add_route_note(text, route)
+
+
+def _execute(run, active_key, input_text, mode, task_type, target_model, num_questions, difficulty,
+             chunked, max_chunk_chars, max_workers, use_cache, on_chunk):
+    cache_key, cached = lookup_result(
+        run, use_cache, input_text, mode, task_type, num_questions, difficulty, target_model
+    )
+    if cached is not None:
+        return cached
+
+    if task_type == "mcq":
+        # Imported here: quiz_engine builds on this module.
+        import quiz_engine
+        questions, used_fallback = quiz_engine.generate_questions(
+            active_key, input_text, target_model, num_questions, difficulty, run=run
+        )
+        text = quiz_engine.quiz_output(questions, quiz_engine.shortfall_notes(questions, num_questions))
+    elif chunked and task_type == "summary" and len(input_text) > max_chunk_chars:
+        text, used_fallback = _summarize_chunked(
+            active_key, input_text, mode, target_model, max_chunk_chars, max_workers, use_cache, on_chunk, run
+        )
+    else:
+        prompt = build_prompt(input_text)
+        text, used_fallback = _generate(active_key, prompt, target_model, on_chunk, run)
+
+    text = add_fallback_note(text, used_fallback)
+    store_result(cache_key, text, used_fallback)
+    return text
+
+
+def process_text(input_text, mode="speed", task_type="summary", api_key=None, num_questions=5, difficulty="Medium",
+                 chunked=False, max_chunk_chars=CHUNK_CHAR_LIMIT, max_workers=MAX_CHUNK_WORKERS, use_cache=True,
+                 on_chunk=None, auto_route=True):
+    try:
+        return run_task(
+            input_text, mode, task_type, api_key, num_questions, difficulty,
+            chunked=chunked, max_chunk_chars=max_chunk_chars, max_workers=max_workers,
+            use_cache=use_cache, on_chunk=on_chunk, auto_route=auto_route
+        )
+    except MissingApiKeyError as e:
+        return f"Error: {e}"
     except Exception as e:
-        return f"API Error: {str(e)}"
\ No newline at end of file
+        return f"API Error: {str(e)}"
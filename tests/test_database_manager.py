@@ -0,0 +1,96 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+import database_manager
+
+
+class HistoryIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.old_name = database_manager.DB_NAME
+        database_manager.DB_NAME = os.path.join(self.tmp.name, "history.db")
+        database_manager.init_db()
+
+    def tearDown(self):
+        database_manager.close_connection()
+        database_manager.DB_NAME = self.old_name
+        self.tmp.cleanup()
+
+    def search_ids(self, text):
+        return [row[0] for row in database_manager.search_history(text)]
+
+    def test_saved_and_deleted_records_are_searchable(self):
+        database_manager.save_summary_records([("photosynthesis notes", "summary one", "speed | Summary"),
+                                               ("membrane proteins", "summary two", "speed | Summary")])
+        quiz_id = database_manager.save_quiz_record("photosynthesis quiz", "1. Q", [], "speed | Quiz")
+        self.assertEqual(len(self.search_ids("photosynthesis")), 2)
+
+        database_manager.delete_records([quiz_id])
+        self.assertEqual(len(self.search_ids("photosynthesis")), 1)
+        self.assertEqual(database_manager.prune_history(max_records=1), 1)
+        self.assertEqual(self.search_ids("photosynthesis"), [])
+        self.assertEqual(len(self.search_ids("membrane")), 1)
+
+    def test_other_sqlite_clients_can_write(self):
+        database_manager.save_summary_record("chlorophyll", "green", "speed | Summary")
+        database_manager.close_connection()
+        # A plain connection has none of the app's SQL functions.
+        conn = sqlite3.connect(database_manager.DB_NAME)
+        with conn:
+            conn.execute("UPDATE chat_history SET mode = 'edited'")
+            conn.execute("DELETE FROM chat_history")
+        conn.close()
+
+        self.assertEqual(self.search_ids("chlorophyll"), [])
+        database_manager.vacuum()
+        database_manager.save_summary_record("chlorophyll again", "green", "speed | Summary")
+        self.assertEqual(len(self.search_ids("chlorophyll")), 1)
+
+    def test_index_over_the_view_is_migrated(self):
+        database_manager.save_summary_record("mitochondria", "powerhouse", "speed | Summary")
+        with database_manager.transaction() as cursor:
+            # The index as older versions created it, reading its text from the view.
+            cursor.execute("DROP TABLE history_fts")
+            cursor.execute('''
+                CREATE VIRTUAL TABLE history_fts USING fts5(
+                    input_text, output_text,
+                    content='chat_history_text', content_rowid='id', prefix='2 3',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            ''')
+            cursor.execute("INSERT INTO history_fts (history_fts) VALUES ('rebuild')")
+        database_manager.init_db()
+        sql = database_manager._get_connection().execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'history_fts'").fetchone()[0]
+        self.assertNotIn("content=", sql)
+        self.assertEqual(database_manager.search_history("powerhouse")[0][3], "[powerhouse]")
+
+    def test_concurrent_saves_of_the_same_text(self):
+        errors = []
+
+        def save():
+            try:
+                # Every thread saves the same texts in the same order, so each save races.
+                for n in range(200):
+                    database_manager.save_summary_record(f"shared input {n}", "shared output", "speed | Summary")
+            except Exception as e:
+                errors.append(e)
+            finally:
+                database_manager.close_connection()
+
+        threads = [threading.Thread(target=save) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        conn = database_manager._get_connection()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM chat_history").fetchone()[0], 1600)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0], 201)
+
+
+if __name__ == '__main__':
+    unittest.main()
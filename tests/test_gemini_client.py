@@ -0,0 +1,72 @@
+import sys
+import types
+import unittest
+from unittest import mock
+
+import gemini_client
+
+
+class ClientManager:
+    def configure(self, api_key):
+        self.api_key = api_key
+
+    def get_default_client(self, name):
+        return (name, self.api_key)
+
+
+class GenerativeModel:
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self._client = None
+        self._async_client = None
+
+
+class OldGenerativeModel:
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+
+def fake_sdk(model_class=GenerativeModel, manager_class=ClientManager):
+    genai = types.ModuleType("google.generativeai")
+    genai.__version__ = "9.9.9"
+    genai.GenerativeModel = model_class
+    client = types.ModuleType("google.generativeai.client")
+    if manager_class is not None:
+        client._ClientManager = manager_class
+    genai.client = client
+    google = types.ModuleType("google")
+    google.generativeai = genai
+    return {"google": google, "google.generativeai": genai, "google.generativeai.client": client}
+
+
+class CheckSdkTest(unittest.TestCase):
+    def setUp(self):
+        gemini_client.reset()
+        gemini_client._sdk_checked = False
+
+    def tearDown(self):
+        gemini_client.reset()
+        gemini_client._sdk_checked = False
+
+    def test_compatible_sdk_pins_clients_per_key(self):
+        with mock.patch.dict(sys.modules, fake_sdk()):
+            model = gemini_client.get_model("key", "gemini-2.5-flash")
+        self.assertEqual(model._client, ("generative", "key"))
+        self.assertIsNone(model._async_client)
+
+    def test_missing_client_manager_names_the_supported_version(self):
+        with mock.patch.dict(sys.modules, fake_sdk(manager_class=None)):
+            with self.assertRaisesRegex(Exception, "9.9.9 has no client._ClientManager; install "
+                                        + gemini_client.SUPPORTED_SDK):
+                gemini_client.get_model("key", "gemini-2.5-flash")
+
+    def test_missing_model_clients_names_the_supported_version(self):
+        with mock.patch.dict(sys.modules, fake_sdk(model_class=OldGenerativeModel)):
+            with self.assertRaisesRegex(Exception, "has no GenerativeModel._client; install "
+                                        + gemini_client.SUPPORTED_SDK):
+                gemini_client.get_model("key", "gemini-2.5-flash")
+        self.assertFalse(gemini_client._sdk_checked)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import json
+import re
+import unittest
+
+import fake_gemini
+import gemini_client
+import quiz_engine
+import resilience
+from fake_gemini import FakeGenerativeModel
+
+
+def question(stem, answer="B"):
+    return {"question": stem, "options": ["one", "two", "three", "four"], "answer": answer,
+            "explanation": "Because."}
+
+
+class ParseQuestionsTest(unittest.TestCase):
+    def test_accepts_fenced_json_and_wrapped_lists(self):
+        raw = "```json\n" + json.dumps([question("What?")]) + "\n```"
+        self.assertEqual(quiz_engine.parse_questions(raw), [{
+            "question": "What?", "options": ["one", "two", "three", "four"], "answer": 1, "explanation": "Because.",
+        }])
+        wrapped = json.dumps({"questions": [question("Why?", "D")]})
+        self.assertEqual(quiz_engine.parse_questions(wrapped)[0]["answer"], 3)
+
+    def test_answers_by_letter_text_or_index(self):
+        items = [question("A?", "c)"), question("B?", "Three"), question("C?", 2)]
+        self.assertEqual([q["answer"] for q in quiz_engine.parse_questions(json.dumps(items))], [2, 2, 2])
+
+    def test_drops_invalid_entries(self):
+        items = [
+            question("Fine?"),
+            question("Unknown answer?", "E"),
+            dict(question("Three options?"), options=["a", "b", "c"]),
+            dict(question("Repeated options?"), options=["a", "A", "b", "c"]),
+            dict(question("   ")),
+            "not an object",
+        ]
+        self.assertEqual([q["question"] for q in quiz_engine.parse_questions(json.dumps(items))], ["Fine?"])
+        self.assertEqual(quiz_engine.parse_questions("not json"), [])
+
+
+class SectionFailsOnce(FakeGenerativeModel):
+    """Answers section 3 of 4 with invalid JSON until failures runs out."""
+
+    failures = 1
+    prompts = []
+
+    def _quiz_for(self, prompt):
+        section = re.search(r"section (\d+) of (\d+)", prompt)
+        type(self).prompts.append((section.group(1) if section else None,
+                                   int(re.search(r"Generate (\d+)", prompt).group(1))))
+        if section and section.group(1) == "3" and type(self).failures:
+            type(self).failures -= 1
+            return "not json"
+        return super()._quiz_for(prompt)
+
+
+class TopUpTest(unittest.TestCase):
+    def setUp(self):
+        resilience._breakers.clear()
+        SectionFailsOnce.prompts = []
+        gemini_client.set_model_factory(lambda model_name: SectionFailsOnce(model_name, latency=0))
+        self.text = "\n\n".join(f"Section paragraph {n} " + "words " * 100 for n in range(40))
+
+    def tearDown(self):
+        fake_gemini.uninstall()
+
+    def test_short_section_is_topped_up_on_that_section(self):
+        SectionFailsOnce.failures = 1
+        questions, _ = quiz_engine.generate_questions("key", self.text, "gemini-2.5-flash", 80)
+        self.assertEqual(len(questions), 80)
+        first_round, top_up = SectionFailsOnce.prompts[:4], SectionFailsOnce.prompts[4:]
+        self.assertEqual(sorted(first_round), [("1", 20), ("2", 20), ("3", 20), ("4", 20)])
+        self.assertEqual(top_up, [("3", 20)])
+
+    def test_shortfall_is_noted(self):
+        SectionFailsOnce.failures = 2
+        questions, _ = quiz_engine.generate_questions("key", self.text, "gemini-2.5-flash", 80)
+        self.assertEqual(len(questions), 60)
+        self.assertEqual(quiz_engine.shortfall_notes(questions, 80),
+                         ["Only 60 of the 80 requested questions could be generated"])
+
+
+if __name__ == "__main__":
+    unittest.main()
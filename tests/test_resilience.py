@@ -0,0 +1,67 @@
+import asyncio
+import unittest
+
+import resilience
+from fake_gemini import FakeAPIError
+
+
+def failing(error):
+    def fn():
+        raise error
+    return fn
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        resilience._breakers.clear()
+
+    def call(self, name, error):
+        with self.assertRaises(type(error)):
+            resilience.call_with_breaker(name, failing(error))
+
+    def test_client_errors_leave_breaker_closed(self):
+        for _ in range(5):
+            self.call("model", FakeAPIError(400, "API key not valid"))
+        self.assertFalse(resilience.get_breaker("model").is_open())
+        self.assertEqual(resilience.call_with_breaker("model", lambda: "ok"), "ok")
+
+    def test_retryable_errors_open_breaker(self):
+        for _ in range(3):
+            self.call("model", FakeAPIError(503))
+        self.assertTrue(resilience.get_breaker("model").is_open())
+        with self.assertRaises(resilience.CircuitOpenError):
+            resilience.call_with_breaker("model", lambda: "ok")
+
+    def test_success_resets_failures(self):
+        self.call("model", FakeAPIError(503))
+        self.call("model", TimeoutError())
+        resilience.call_with_breaker("model", lambda: "ok")
+        self.call("model", FakeAPIError(429))
+        self.assertFalse(resilience.get_breaker("model").is_open())
+        self.assertEqual(resilience.get_breaker("model").failures, 1)
+
+    def test_client_error_on_trial_call_frees_the_trial(self):
+        breaker = resilience.get_breaker("model")
+        breaker.cooldown = 0
+        for _ in range(3):
+            self.call("model", FakeAPIError(503))
+        self.call("model", FakeAPIError(400))
+        # The next call is still let through as a trial, and its success closes the circuit.
+        self.assertEqual(resilience.call_with_breaker("model", lambda: "ok"), "ok")
+        self.assertIsNone(breaker.opened_at)
+
+    def test_async_client_errors_leave_breaker_closed(self):
+        async def bad_key():
+            raise FakeAPIError(400, "API key not valid")
+
+        async def run():
+            for _ in range(5):
+                with self.assertRaises(FakeAPIError):
+                    await resilience.call_with_breaker_async("model", bad_key)
+
+        asyncio.run(run())
+        self.assertFalse(resilience.get_breaker("model").is_open())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+import async_engine
+import database_manager
+import fake_gemini
+import gemini_client
+import quiz_engine
+import resilience
+import result_cache
+import summarizer_logic
+from fake_gemini import FakeAPIError, FakeGenerativeModel
+
+
+class PrimaryDown(FakeGenerativeModel):
+    """The primary models fail while down is set; the fallback model always answers."""
+
+    down = True
+
+    def _maybe_fail(self):
+        if type(self).down and self.model_name != summarizer_logic.FALLBACK_MODEL:
+            raise FakeAPIError(503)
+
+
+def reset_cache_connection():
+    if result_cache._conn is not None:
+        result_cache._conn.close()
+        result_cache._conn = None
+
+
+class FallbackCachingTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.names = database_manager.DB_NAME, result_cache.CACHE_DB_NAME, summarizer_logic.MAX_RETRIES
+        database_manager.DB_NAME = os.path.join(self.tmp.name, "history.db")
+        database_manager.init_db()
+        reset_cache_connection()
+        result_cache.CACHE_DB_NAME = os.path.join(self.tmp.name, "cache.db")
+        summarizer_logic.MAX_RETRIES = 0
+        resilience._breakers.clear()
+        PrimaryDown.down = True
+        gemini_client.set_model_factory(lambda model_name: PrimaryDown(model_name, latency=0, chunk_delay=0))
+        self.text = "Some text to summarize. " * 40
+
+    def tearDown(self):
+        fake_gemini.uninstall()
+        resilience._breakers.clear()
+        reset_cache_connection()
+        database_manager.close_connection()
+        database_manager.DB_NAME, result_cache.CACHE_DB_NAME, summarizer_logic.MAX_RETRIES = self.names
+        self.tmp.cleanup()
+
+    def recover(self):
+        PrimaryDown.down = False
+        resilience._breakers.clear()
+
+    def test_fallback_summaries_are_not_cached(self):
+        self.assertIn(summarizer_logic.FALLBACK_NOTE, summarizer_logic.run_task(self.text, api_key="key"))
+        self.recover()
+        self.assertNotIn(summarizer_logic.FALLBACK_NOTE, summarizer_logic.run_task(self.text, api_key="key"))
+
+    def test_fallback_summaries_are_not_cached_async(self):
+        output = asyncio.run(async_engine.run_task_async(self.text, api_key="key"))
+        self.assertIn(summarizer_logic.FALLBACK_NOTE, output)
+        self.recover()
+        output = asyncio.run(async_engine.run_task_async(self.text, api_key="key"))
+        self.assertNotIn(summarizer_logic.FALLBACK_NOTE, output)
+
+    def test_fallback_quizzes_are_not_cached(self):
+        _, notes = quiz_engine.generate_quiz(self.text, api_key="key", num_questions=3)
+        self.assertEqual(notes, [summarizer_logic.FALLBACK_NOTE])
+        self.recover()
+        _, notes = quiz_engine.generate_quiz(self.text, api_key="key", num_questions=3)
+        self.assertEqual(notes, [])
+        _, notes = asyncio.run(quiz_engine.generate_quiz_async(self.text, api_key="key", num_questions=3))
+        self.assertEqual(notes, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
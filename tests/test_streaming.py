@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+
+import async_engine
+import fake_gemini
+import gemini_client
+import resilience
+import summarizer_logic
+from fake_gemini import FakeAPIError, FakeChunk, FakeGenerativeModel
+
+
+class BrokenStream(fake_gemini.FakeResponse):
+    """Streams its first chunk, then fails like a dropped connection."""
+
+    def __iter__(self):
+        yield FakeChunk(self._chunks[0])
+        raise FakeAPIError(503)
+
+    async def __aiter__(self):
+        yield FakeChunk(self._chunks[0])
+        raise FakeAPIError(503)
+
+
+class BreaksMidStream(FakeGenerativeModel):
+    def _response(self, prompt, stream, generation_config):
+        response = super()._response(prompt, stream, generation_config)
+        if stream and self.model_name != summarizer_logic.FALLBACK_MODEL:
+            return BrokenStream(response.text, response.usage_metadata, response._chunks)
+        return response
+
+
+class FailsUpFront(FakeGenerativeModel):
+    def _maybe_fail(self):
+        if self.model_name != summarizer_logic.FALLBACK_MODEL:
+            raise FakeAPIError(503)
+
+
+class StreamFallbackTest(unittest.TestCase):
+    def setUp(self):
+        resilience._breakers.clear()
+        self.retries = summarizer_logic.MAX_RETRIES
+        summarizer_logic.MAX_RETRIES = 0
+
+    def tearDown(self):
+        summarizer_logic.MAX_RETRIES = self.retries
+        fake_gemini.uninstall()
+        resilience._breakers.clear()
+
+    def use(self, model_class):
+        gemini_client.set_model_factory(lambda model_name: model_class(model_name, latency=0, chunk_delay=0))
+
+    def test_error_after_streamed_text_is_raised(self):
+        self.use(BreaksMidStream)
+        pieces = []
+        with self.assertRaises(FakeAPIError):
+            summarizer_logic._generate("key", "prompt " * 50, "gemini-2.5-pro", pieces.append)
+        self.assertEqual(len(pieces), 1)
+
+    def test_error_after_streamed_text_is_raised_async(self):
+        self.use(BreaksMidStream)
+        pieces = []
+        with self.assertRaises(FakeAPIError):
+            asyncio.run(async_engine.generate_async("key", "prompt " * 50, "gemini-2.5-pro", pieces.append))
+        self.assertEqual(len(pieces), 1)
+
+    def test_error_before_any_text_falls_back(self):
+        self.use(FailsUpFront)
+        pieces = []
+        text, used_fallback = summarizer_logic._generate("key", "prompt " * 50, "gemini-2.5-pro", pieces.append)
+        self.assertTrue(used_fallback)
+        self.assertEqual("".join(pieces), text)
+
+        pieces = []
+        text, used_fallback = asyncio.run(
+            async_engine.generate_async("key", "prompt " * 50, "gemini-2.5-pro", pieces.append)
+        )
+        self.assertTrue(used_fallback)
+        self.assertEqual("".join(pieces), text)
+
+
+if __name__ == "__main__":
+    unittest.main()
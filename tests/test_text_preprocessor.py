@@ -0,0 +1,128 @@
+import os
+import tempfile
+import unittest
+
+import document_handler
+import text_preprocessor
+from text_preprocessor import (
+    MIN_DUPLICATE_CHARS, PAGE_JOIN, _HYPHEN_BREAK, clean_pages, find_repeated_lines, new_stats,
+    paragraph_blocks, preprocess_text, strip_headers,
+)
+
+
+class StripHeadersTest(unittest.TestCase):
+    def test_removes_repeated_lines_and_page_numbers_at_the_edges(self):
+        bodies = ["Markets grew.", "Costs fell.", "Staff doubled.", "Outlook is stable."]
+        pages = [f"ACME Annual Report\n\n{body}\nPage {n} of 9" for n, body in enumerate(bodies, 1)]
+        repeated = find_repeated_lines(pages)
+        lines, removed = strip_headers(pages[1].split("\n"), repeated)
+        self.assertEqual(lines, ["Costs fell."])
+        self.assertEqual(removed, 2)
+
+    def test_keeps_repeated_lines_inside_the_page(self):
+        repeated = {"see also"}
+        lines = ["Intro", "See also", "Details", "More", "End"]
+        self.assertEqual(strip_headers(lines, repeated), (lines, 0))
+
+    def test_too_few_pages_repeat_nothing(self):
+        self.assertEqual(find_repeated_lines(["Header\nA", "Header\nB"]), set())
+
+
+class HyphenBreakTest(unittest.TestCase):
+    def join(self, text):
+        return _HYPHEN_BREAK.sub("", text)
+
+    def test_joins_a_word_broken_across_lines(self):
+        self.assertEqual(self.join("distributed compu-\nting"), "distributed computing")
+        self.assertEqual(self.join("compu- \n  ting"), "computing")
+
+    def test_keeps_hyphens_before_capitals_and_digits(self):
+        self.assertEqual(self.join("Well-\nKnown"), "Well-\nKnown")
+        self.assertEqual(self.join("pages 10-\n12"), "pages 10-\n12")
+        self.assertEqual(self.join("version 2-\nbeta"), "version 2-\nbeta")
+
+
+class DuplicateParagraphTest(unittest.TestCase):
+    def test_drops_long_duplicates_and_keeps_short_ones(self):
+        long_paragraph = "This paragraph is long enough to count as a duplicate."
+        self.assertGreaterEqual(len(long_paragraph), MIN_DUPLICATE_CHARS)
+        text = f"{long_paragraph}\n\nExample:\n\n{long_paragraph.upper()}\n\nExample:"
+        cleaned, stats = preprocess_text(text)
+        self.assertEqual(cleaned, f"{long_paragraph}\n\nExample:\n\nExample:")
+        self.assertEqual(stats["duplicate_paragraphs"], 1)
+
+    def test_paragraphs_differing_in_numbers_are_kept(self):
+        first = "Revenue for the quarter came to 120 million dollars."
+        second = "Revenue for the quarter came to 135 million dollars."
+        cleaned, stats = preprocess_text(f"{first}\n\n{second}")
+        self.assertEqual(cleaned, f"{first}\n\n{second}")
+        self.assertEqual(stats["duplicate_paragraphs"], 0)
+
+
+class ParagraphBlocksTest(unittest.TestCase):
+    def test_blocks_split_at_paragraph_breaks_and_rebuild_the_text(self):
+        paragraphs = [f"Paragraph {n} " + "word " * 20 for n in range(50)]
+        blocks = list(paragraph_blocks(paragraphs, "\n\n", block_chars=500))
+        self.assertGreater(len(blocks), 1)
+        self.assertEqual("".join(blocks), "\n\n".join(paragraphs))
+        for block in blocks[:-1]:
+            self.assertTrue(block.endswith("\n\n"))
+            self.assertLess(len(block), 500 + 200)
+
+    def test_cleaning_in_blocks_matches_cleaning_whole(self):
+        repeated = "A repeated paragraph that is quite a bit longer than forty characters."
+        paragraphs = [f"Section {n}: compu-\nting " + "text " * 30 for n in range(40)] + [repeated] * 3
+        text = "\n\n".join(paragraphs)
+        whole, whole_stats = preprocess_text(text)
+        stats = new_stats()
+        blocks = paragraph_blocks(iter(paragraphs), "\n\n", block_chars=400)
+        cleaned = PAGE_JOIN.join(clean_pages(blocks, stats, paged=False))
+        self.assertEqual(cleaned, whole)
+        self.assertEqual(stats, whole_stats)
+
+    def test_unpaged_cleaning_does_not_read_ahead(self):
+        consumed = []
+
+        def pieces():
+            for n in range(text_preprocessor.SAMPLE_PAGES * 2):
+                consumed.append(n)
+                yield f"Block {n}\n\n"
+
+        pages = clean_pages(pieces(), paged=False)
+        next(pages)
+        self.assertEqual(len(consumed), 1)
+        pages.close()
+
+
+class DocxParagraphsTest(unittest.TestCase):
+    DISCLAIMER = "This document is confidential and intended only for its recipients."
+
+    def setUp(self):
+        import docx
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "report.docx")
+        doc = docx.Document()
+        for text in (self.DISCLAIMER, "Item one is well-", "known fact", self.DISCLAIMER):
+            doc.add_paragraph(text)
+        doc.save(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def check(self, cleaned, stats):
+        self.assertEqual(cleaned, f"{self.DISCLAIMER}\n\nItem one is well-\n\nknown fact")
+        self.assertEqual(stats["duplicate_paragraphs"], 1)
+        self.assertEqual(stats["hyphens_joined"], 0)
+
+    def test_streamed_paragraphs_are_cleaned_one_by_one(self):
+        separator, pieces = document_handler.iter_document(self.path, use_cache=False)
+        stats = new_stats()
+        cleaned = PAGE_JOIN.join(clean_pages(paragraph_blocks(pieces, separator), stats, paged=False))
+        self.check(cleaned, stats)
+
+    def test_extracted_text_keeps_paragraphs_apart(self):
+        self.check(*preprocess_text(document_handler.extract_text(self.path, use_cache=False)))
+
+
+if __name__ == "__main__":
+    unittest.main()
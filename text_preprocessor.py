@@ -0,0 +1,220 @@
+import hashlib
+import math
+import re
+
+from document_handler import PAGE_BREAK
+from metrics import increment, timed
+from token_budget import CHARS_PER_TOKEN
+
+# Cleaned pages are joined with a paragraph break.
+PAGE_JOIN = "\n\n"
+# Running headers/footers are looked for in this many lines at each end of a page.
+EDGE_LINES = 2
+# A line counts as a running header/footer when it (with digits ignored)
+# sits at the edge of at least this share of pages, and of at least MIN_REPEAT_PAGES.
+REPEAT_FRACTION = 0.3
+MIN_REPEAT_PAGES = 3
+# Pages buffered to learn the repeated lines before cleaned pages are passed on.
+SAMPLE_PAGES = 64
+# Shorter paragraphs ("Example:", "Figure 2") legitimately repeat and are kept.
+MIN_DUPLICATE_CHARS = 40
+# Text without page breaks is cleaned in blocks of about this many characters.
+BLOCK_CHARS = 256 * 1024
+
+_DIGITS = re.compile(r"\d+")
+_SPACES = re.compile(r"[ \t\u00a0\u2000-\u200a\u202f\u3000]+")
+_PAGE_NUMBER = re.compile(
+    r"^(?:page\s+)?[-–—]?\s*\d+\s*[-–—]?(?:\s*(?:of|/)\s*\d+)?$", re.IGNORECASE
+)
+# A lowercase word continued on the next line after a hyphen: "compu-\nting".
+_HYPHEN_BREAK = re.compile(r"(?<=[^\W\d_])-[ \t]*\n[ \t]*(?=[a-z\u00df-\u00ff])")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def new_stats():
+    return {
+        "chars_before": 0,
+        "chars_after": 0,
+        "header_lines": 0,
+        "hyphens_joined": 0,
+        "duplicate_paragraphs": 0,
+    }
+
+
+def _paragraph_key(paragraph):
+    return _SPACES.sub(" ", paragraph.lower().replace("\n", " "))
+
+
+def _edge_key(line):
+    """Compares header/footer lines with page numbers and spacing ignored."""
+    return _DIGITS.sub("#", _SPACES.sub(" ", line.strip().lower()))
+
+
+def _edge_keys(lines):
+    content = [line for line in lines if line.strip()]
+    return {_edge_key(line) for line in content[:EDGE_LINES] + content[-EDGE_LINES:]}
+
+
+def find_repeated_lines(pages):
+    """Returns the edge-line keys repeated across enough of pages to be
+    running headers or footers."""
+    if len(pages) < MIN_REPEAT_PAGES:
+        return set()
+    counts = {}
+    for page in pages:
+        for key in _edge_keys(page.split("\n")):
+            counts[key] = counts.get(key, 0) + 1
+    threshold = max(MIN_REPEAT_PAGES, math.ceil(REPEAT_FRACTION * len(pages)))
+    return {key for key, count in counts.items() if count >= threshold}
+
+
+def _is_header(line, repeated):
+    stripped = line.strip()
+    return bool(_PAGE_NUMBER.match(stripped)) or _edge_key(stripped) in repeated
+
+
+def strip_headers(lines, repeated):
+    """Drops running header/footer and page number lines from the edges of a page.
+    Returns (lines, removed)."""
+    start, end = 0, len(lines)
+    removed = 0
+    for _ in range(EDGE_LINES):
+        while start < end and not lines[start].strip():
+            start += 1
+        if start < end and _is_header(lines[start], repeated):
+            start += 1
+            removed += 1
+    for _ in range(EDGE_LINES):
+        while end > start and not lines[end - 1].strip():
+            end -= 1
+        if end > start and _is_header(lines[end - 1], repeated):
+            end -= 1
+            removed += 1
+    return lines[start:end], removed
+
+
+def collapse_whitespace(text):
+    lines = [_SPACES.sub(" ", line).strip() for line in text.split("\n")]
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def _block_end(text):
+    """Where to cut a block: after its last paragraph break, else its last line break."""
+    for boundary in ("\n\n", "\n"):
+        end = text.rfind(boundary)
+        if end > 0:
+            return end + len(boundary)
+    return len(text)
+
+
+def paragraph_blocks(pieces, separator="", block_chars=BLOCK_CHARS):
+    """Regroups a stream of text pieces, joined with separator, into
+    consecutive blocks of about block_chars characters cut at paragraph
+    breaks, for clean_pages(..., paged=False)."""
+    buffer = []
+    buffered = 0
+    for piece in pieces:
+        if buffer:
+            piece = separator + piece
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= block_chars:
+            text = "".join(buffer)
+            end = _block_end(text)
+            yield text[:end]
+            buffer = [text[end:]]
+            buffered = len(text) - end
+    text = "".join(buffer)
+    if text:
+        yield text
+
+
+def _clean_page(page, repeated, paged, seen, stats):
+    stats["chars_before"] += len(page)
+    text = page.replace("\r\n", "\n").replace("\r", "\n")
+    if paged:
+        lines, removed = strip_headers(text.split("\n"), repeated)
+        stats["header_lines"] += removed
+        text = "\n".join(lines)
+    text, joined = _HYPHEN_BREAK.subn("", text)
+    stats["hyphens_joined"] += joined
+    text = collapse_whitespace(text)
+
+    kept = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        if len(paragraph) >= MIN_DUPLICATE_CHARS:
+            digest = hashlib.blake2b(_paragraph_key(paragraph).encode("utf-8"), digest_size=16).digest()
+            if digest in seen:
+                stats["duplicate_paragraphs"] += 1
+                continue
+            seen.add(digest)
+        kept.append(paragraph)
+    return "\n\n".join(kept)
+
+
+@timed("preprocess")
+def clean_pages(pages, stats=None, paged=True):
+    """Yields the cleaned text of each page, dropping pages left empty; join
+    them with PAGE_JOIN. Running headers/footers are learned from the first
+    SAMPLE_PAGES pages and only removed when paged is true; otherwise pages
+    are consecutive blocks of one text (see paragraph_blocks). Counts of
+    what was removed are added to stats (see new_stats)."""
+    stats = stats if stats is not None else new_stats()
+    pages = iter(pages)
+    sample = []
+    if paged:
+        for page in pages:
+            sample.append(page)
+            if len(sample) >= SAMPLE_PAGES:
+                break
+    repeated = find_repeated_lines(sample)
+
+    seen = set()
+    first = True
+
+    def clean(page):
+        nonlocal first
+        text = _clean_page(page, repeated, paged, seen, stats)
+        if paged and not first:
+            # Page breaks the source had, whether or not the page survives.
+            stats["chars_before"] += len(PAGE_BREAK)
+        first = False
+        return text
+
+    emitted = False
+    for source in (sample, pages):
+        for page in source:
+            text = clean(page)
+            if not text:
+                continue
+            stats["chars_after"] += len(text) + (len(PAGE_JOIN) if emitted else 0)
+            emitted = True
+            yield text
+    increment("preprocess_chars_saved", stats["chars_before"] - stats["chars_after"])
+
+
+def preprocess_text(text, stats=None):
+    """Cleans a whole text; pages are separated by PAGE_BREAK. Returns (text, stats)."""
+    stats = stats if stats is not None else new_stats()
+    pages = text.split(PAGE_BREAK)
+    cleaned = PAGE_JOIN.join(clean_pages(pages, stats, paged=len(pages) > 1))
+    return cleaned, stats
+
+
+def tokens_saved(stats):
+    return max(0, stats["chars_before"] - stats["chars_after"]) // CHARS_PER_TOKEN
+
+
+def describe_savings(stats):
+    saved = max(0, stats["chars_before"] - stats["chars_after"])
+    share = saved / stats["chars_before"] * 100 if stats["chars_before"] else 0
+    details = []
+    if stats["header_lines"]:
+        details.append(f"{stats['header_lines']:,} header/footer lines")
+    if stats["hyphens_joined"]:
+        details.append(f"{stats['hyphens_joined']:,} hyphenated breaks")
+    if stats["duplicate_paragraphs"]:
+        details.append(f"{stats['duplicate_paragraphs']:,} duplicate paragraphs")
+    text = f"Cleanup saved {saved:,} characters (~{tokens_saved(stats):,} tokens, {share:.1f}%)"
+    return f"{text}: {', '.join(details)}" if details else text
@@ -0,0 +1,173 @@
+"""Token estimates, latency estimates and route selection, done before a
+request is sent: whether it runs as a single call, as a chunked map-reduce or
+on the faster model because it is over the token budget."""
+import math
+import statistics
+
+import gemini_client
+from metrics import timed
+
+# Rough token count for English prose; count_tokens() asks the API for the exact figure.
+CHARS_PER_TOKEN = 4
+
+# Inputs estimated above this many tokens run on the speed-mode model even in
+# accuracy mode. Set from --token-budget.
+TOKEN_BUDGET = 200000
+# Largest input a single call may carry; larger summaries are always chunked.
+MAX_SINGLE_CALL_TOKENS = 900000
+
+# Latency profile per model: (fixed seconds per call, input tokens/s, output tokens/s).
+MODEL_PROFILES = {
+    "gemini-2.5-flash": (0.8, 20000, 180),
+    "gemini-2.5-pro": (2.5, 8000, 70),
+    "gemini-2.0-flash": (0.5, 25000, 220),
+}
+DEFAULT_PROFILE = (1.5, 10000, 100)
+
+# Expected output size: a summary is about a tenth of its input, within bounds.
+SUMMARY_OUTPUT_RATIO = 0.1
+MIN_SUMMARY_OUTPUT_TOKENS = 200
+MAX_SUMMARY_OUTPUT_TOKENS = 2000
+QUIZ_OUTPUT_TOKENS_PER_QUESTION = 120
+
+# Stable chunks are between half and all of the chunk limit long.
+AVERAGE_CHUNK_FILL = 0.75
+
+# Per model, observed / estimated duration of recent single-call runs.
+MIN_CALIBRATION_RUNS = 5
+_calibration = {}
+
+
+def tokens_for_chars(chars):
+    return chars // CHARS_PER_TOKEN + 1
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting (about four characters per token)."""
+    return tokens_for_chars(len(text))
+
+
+@timed("tokens.count")
+def count_tokens(text, model_name, api_key):
+    """Exact input token count from the API (one extra request); raises on failure."""
+    return gemini_client.get_model(api_key, model_name).count_tokens(text).total_tokens
+
+
+def expected_output_tokens(task_type, input_tokens, num_questions=5):
+    if task_type == "mcq":
+        return num_questions * QUIZ_OUTPUT_TOKENS_PER_QUESTION
+    return int(max(MIN_SUMMARY_OUTPUT_TOKENS, min(MAX_SUMMARY_OUTPUT_TOKENS, input_tokens * SUMMARY_OUTPUT_RATIO)))
+
+
+def estimate_call_seconds(model_name, input_tokens, output_tokens):
+    overhead, input_rate, output_rate = MODEL_PROFILES.get(model_name, DEFAULT_PROFILE)
+    seconds = overhead + input_tokens / input_rate + output_tokens / output_rate
+    return seconds * _calibration.get(model_name, 1.0)
+
+
+def calibrate(samples):
+    """Scales the latency profiles to (model, tokens_in, tokens_out, total_ms)
+    samples of recent single-call runs."""
+    ratios = {}
+    for model_name, tokens_in, tokens_out, total_ms in samples:
+        overhead, input_rate, output_rate = MODEL_PROFILES.get(model_name, DEFAULT_PROFILE)
+        estimate = overhead + tokens_in / input_rate + tokens_out / output_rate
+        ratios.setdefault(model_name, []).append(total_ms / 1000 / estimate)
+    _calibration.clear()
+    for model_name, values in ratios.items():
+        if len(values) >= MIN_CALIBRATION_RUNS:
+            _calibration[model_name] = max(0.2, min(5.0, statistics.median(values)))
+
+
+def load_calibration():
+    """Calibrates from the run history; the defaults stay when it can't be read."""
+    # Imported here: database_manager is not needed for plain estimates.
+    from database_manager import get_latency_samples
+    try:
+        calibrate(get_latency_samples())
+    except Exception:
+        pass
+
+
+class Route:
+    """How a request will run: on which model, as how many calls, and about how long."""
+
+    def __init__(self, model, requested_model, strategy, tokens, calls, seconds, budget):
+        self.model = model
+        self.requested_model = requested_model
+        self.strategy = strategy
+        self.tokens = tokens
+        self.calls = calls
+        self.seconds = seconds
+        self.budget = budget
+
+    @property
+    def downgraded(self):
+        return self.model != self.requested_model
+
+    def note(self):
+        return (f"Input of ~{self.tokens:,} tokens is over the {self.budget:,}-token budget for "
+                f"'{self.requested_model}'; used '{self.model}' instead")
+
+    def describe(self):
+        calls = "1 call" if self.calls == 1 else f"{self.calls} calls ({self.strategy})"
+        text = f"~{self.seconds:,.0f} s, {calls} on {self.model}"
+        if self.downgraded:
+            text += f" (over the {self.budget:,}-token budget for {self.requested_model})"
+        return text
+
+    def as_dict(self):
+        return {
+            "model": self.model, "requested_model": self.requested_model, "strategy": self.strategy,
+            "tokens": self.tokens, "calls": self.calls, "estimated_seconds": round(self.seconds, 1),
+            "downgraded": self.downgraded,
+        }
+
+
+def _chunked_estimate(model_name, chars, tokens, max_chunk_chars, max_workers):
+    """(calls, seconds) of a map-reduce summary, mirroring _summarize_chunked."""
+    chunks = max(1, math.ceil(chars / (max_chunk_chars * AVERAGE_CHUNK_FILL)))
+    output = expected_output_tokens("summary", tokens / chunks)
+    calls = chunks
+    seconds = math.ceil(chunks / max_workers) * estimate_call_seconds(model_name, tokens / chunks, output)
+    merged = chunks * output
+    while merged * CHARS_PER_TOKEN > max_chunk_chars:
+        groups = math.ceil(merged * CHARS_PER_TOKEN / max_chunk_chars)
+        if groups == 1:
+            break
+        calls += groups
+        seconds += math.ceil(groups / max_workers) * estimate_call_seconds(model_name, merged / groups, output)
+        merged = groups * output
+    return calls + 1, seconds + estimate_call_seconds(model_name, merged, output)
+
+
+def plan_route(chars, mode="speed", task_type="summary", num_questions=5, tokens=None, budget=None,
+               chunked=True, max_chunk_chars=None, max_workers=None):
+    """Picks the model and strategy for an input of chars characters (tokens,
+    when known exactly, replaces the estimate). Summaries too large for one
+    call are chunked even when chunked is false."""
+    # Imported here: summarizer_logic and quiz_engine build on this module.
+    import summarizer_logic
+    max_chunk_chars = max_chunk_chars or summarizer_logic.CHUNK_CHAR_LIMIT
+    max_workers = max_workers or summarizer_logic.MAX_CHUNK_WORKERS
+    budget = TOKEN_BUDGET if budget is None else budget
+    tokens = tokens_for_chars(chars) if tokens is None else tokens
+
+    requested = summarizer_logic.model_for_mode(mode)
+    model = summarizer_logic.model_for_mode("speed") if tokens > budget else requested
+
+    if task_type == "mcq":
+        import quiz_engine
+        shards = math.ceil(num_questions / quiz_engine.QUESTIONS_PER_SHARD)
+        per_shard = math.ceil(num_questions / shards)
+        seconds = math.ceil(shards / quiz_engine.MAX_SHARD_WORKERS) * estimate_call_seconds(
+            model, tokens / shards, expected_output_tokens("mcq", 0, per_shard)
+        )
+        return Route(model, requested, "sharded" if shards > 1 else "single", tokens, shards, seconds, budget)
+
+    single_seconds = estimate_call_seconds(model, tokens, expected_output_tokens(task_type, tokens))
+    too_large = tokens > MAX_SINGLE_CALL_TOKENS or single_seconds > summarizer_logic.REQUEST_TIMEOUT
+    if task_type == "summary" and chars > max_chunk_chars and (chunked or too_large):
+        calls, seconds = _chunked_estimate(model, chars, tokens, max_chunk_chars, max_workers)
+        return Route(model, requested, "chunked", tokens, calls, seconds, budget)
+    return Route(model, requested, "single", tokens, 1, single_seconds, budget)